@@ -0,0 +1,198 @@
+# Headless batch mode. Formats every matching file in a directory or glob pattern with the same
+# processing as the GUI, spread across a pool of worker processes, and writes one output per input.
+#
+# Example:
+#   python main.py "exports/*.csv" --format "Gmetrix Raw Data" --output-dir formatted
+#   python batch.py exports --format "NorthStar for CTRL-R Import" --certificates-needed 6
+#   python batch.py exports --format "Gmetrix for CTRL-R Import" --output-type csv
+#   python main.py "exports/*.xlsx" --merge "CTRL-R import.xlsx"
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from cache import InputCache, default_cache_dir
+from incremental import ImportState, default_state_path
+from merge import merge_files
+from profiler import default_log_path
+from profiles import PROFILE_ERROR
+from processing import CTRLR_FORMATS, DEFAULT_OPTIONS, FORMAT_SETTINGS, ProcessingError
+from worker import save_formatted_file
+
+INPUT_EXTENSIONS = ('.csv', '.xlsx', '.xls')
+OUTPUT_SUFFIX = " - FORMATTED"
+OUTPUT_TYPES = ('xlsx', 'csv', 'parquet')
+
+# Function to expand the input arguments (directories, glob patterns or file names) into a sorted list of files.
+def collect_input_files(inputs):
+    files = []
+    for pattern in inputs:
+        if os.path.isdir(pattern):
+            matches = [os.path.join(pattern, name) for name in os.listdir(pattern)]
+        else:
+            matches = glob.glob(pattern)
+        files.extend(path for path in matches
+                     if os.path.isfile(path) and path.lower().endswith(INPUT_EXTENSIONS)
+                     and not os.path.splitext(path)[0].endswith(OUTPUT_SUFFIX))
+    return sorted(set(files))
+
+# Function to build the output path for an input file.
+def output_path_for(input_path, output_dir=None, output_type='xlsx'):
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    return os.path.join(output_dir or os.path.dirname(input_path), f"{stem}{OUTPUT_SUFFIX}.{output_type}")
+
+# Function to process and save a single file. Runs in a worker process, so it reports errors in its
+# result instead of raising them. With a state database, CTRL-R imports only keep new or changed rows.
+def format_one(input_path, output_path, format_setting, options, cache_dir=None, state_path=None,
+               log_path=None, dump_dir=None):
+    start = time.perf_counter()
+    summary = ""
+    try:
+        cache = None
+        if cache_dir:
+            # Workers may be fresh processes, so logging is set up here for the cache hit and miss lines.
+            logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+            cache = InputCache(cache_dir)
+        state = ImportState(state_path) if state_path and format_setting in CTRLR_FORMATS else None
+        try:
+            rows, changes = save_formatted_file(input_path, output_path, format_setting, options, cache, state,
+                                                log_path=log_path, dump_dir=dump_dir)
+        finally:
+            if state is not None:
+                state.close()
+        if changes is not None:
+            summary = f", {changes.summary()}"
+    except ProcessingError as e:
+        return input_path, output_path, time.perf_counter() - start, 0, summary, str(e)
+    except Exception as e:
+        return input_path, output_path, time.perf_counter() - start, 0, summary, f"{type(e).__name__}: {e}"
+    return input_path, output_path, time.perf_counter() - start, rows, summary, None
+
+# Function to convert the command line arguments into the options used by processing.py.
+def options_from_args(args):
+    options = dict(DEFAULT_OPTIONS)
+    options['sort_order'] = args.sort_order
+    options['word_wrap'] = 0 if args.no_word_wrap else 1
+    options['center_text'] = 0 if args.no_center_text else 1
+    if args.column_width is not None:
+        options['autosize_columns'] = 0
+        options['resize_columns'] = 1
+        options['column_width'] = args.column_width
+    options['passing_percentage'] = args.passing_percentage
+    options['northstar_passing_certificates'] = args.certificates_needed
+    return options
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Format a batch of PyramidCDC learning platform exports without the GUI.")
+    parser.add_argument('inputs', nargs='+', help="Directories, glob patterns or files to format.")
+    parser.add_argument('--format', choices=FORMAT_SETTINGS, dest='format_setting',
+                        help="Format setting, as named in the GUI dropdown. Required unless --merge is given.")
+    parser.add_argument('--merge', metavar='OUTPUT',
+                        help="Merge CTRL-R exports into the one import file OUTPUT instead of formatting each file. "
+                             "The platform of each file is worked out from its columns unless --format is given, "
+                             "and files from none of the platforms are skipped and listed.")
+    parser.add_argument('--output-dir', help="Directory for the formatted files. Defaults to the directory of each input.")
+    parser.add_argument('--output-type', choices=OUTPUT_TYPES, default='xlsx',
+                        help="Type of file to write. The CTRL-R formats can also be written as CSV or Parquet "
+                             "(Parquet needs pyarrow). A merged import takes its type from the extension of OUTPUT.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes. Defaults to the number of CPUs.")
+    parser.add_argument('--sort-order', choices=("Ascending", "Descending", "Unsorted"), default=DEFAULT_OPTIONS['sort_order'])
+    parser.add_argument('--no-word-wrap', action='store_true', help="Do not wrap text.")
+    parser.add_argument('--no-center-text', action='store_true', help="Do not center text.")
+    parser.add_argument('--column-width', type=int, help="Resize every column to this width instead of autosizing.")
+    parser.add_argument('--passing-percentage', type=int, default=DEFAULT_OPTIONS['passing_percentage'])
+    parser.add_argument('--certificates-needed', type=int, default=DEFAULT_OPTIONS['northstar_passing_certificates'],
+                        help="NorthStar certificates needed to pass.")
+    parser.add_argument('--cache', nargs='?', const=True, default=None, metavar='DIR',
+                        help="Reuse parsed input files from an earlier run. Uses the GUI's cache directory unless DIR is given.")
+    parser.add_argument('--incremental', nargs='?', const=True, default=None, metavar='STATE_DB',
+                        help="For the CTRL-R formats, only write rows that are new or changed since the last run. "
+                             "Uses the GUI's state database unless STATE_DB is given.")
+    parser.add_argument('--timing-log', default=default_log_path(), metavar='PATH',
+                        help="File to add the time of each stage of every file to, as JSON lines. Defaults to the GUI's timing log.")
+    parser.add_argument('--no-timing-log', action='store_true', help="Do not write the timing log.")
+    parser.add_argument('--profile-dir', metavar='DIR',
+                        help="Profile each file with cProfile and tracemalloc and write the results to DIR.")
+    return parser
+
+def main(argv=None):
+    # Formatting with the built-in profiles instead of the ones asked for could quietly give the wrong
+    # output, and a format from the file would only be reported as an invalid choice.
+    if PROFILE_ERROR is not None:
+        print(f"FAILED loading the format profiles: {PROFILE_ERROR}", file=sys.stderr)
+        return 1
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.merge is None and args.format_setting is None:
+        parser.error("--format is required unless --merge is given")
+    if args.merge is not None and args.format_setting not in (None,) + CTRLR_FORMATS:
+        parser.error("--merge only works with the CTRL-R format settings")
+    if args.output_type != 'xlsx' and args.merge is None and args.format_setting not in CTRLR_FORMATS:
+        parser.error("only the CTRL-R format settings can be written as CSV or Parquet")
+    options = options_from_args(args)
+
+    input_files = collect_input_files(args.inputs)
+    if not input_files:
+        print("No input files found.", file=sys.stderr)
+        return 1
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    cache_dir = None
+    if args.cache:
+        cache_dir = default_cache_dir() if args.cache is True else args.cache
+    log_path = None if args.no_timing_log else args.timing_log
+    state_path = None
+    if args.incremental:
+        state_path = default_state_path() if args.incremental is True else args.incremental
+    if args.merge is not None:
+        return run_merge(args, input_files, options, cache_dir, state_path, log_path)
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(format_one, path, output_path_for(path, args.output_dir, args.output_type), args.format_setting, options,
+                                   cache_dir, state_path, log_path, args.profile_dir)
+                   for path in input_files]
+        for future in as_completed(futures):
+            input_path, output_path, seconds, rows, summary, error = future.result()
+            results.append((seconds, error))
+            if error:
+                print(f"FAILED {input_path} ({seconds:.2f}s): {error}")
+            else:
+                print(f"OK     {input_path} -> {output_path} ({rows} rows{summary}, {seconds:.2f}s)")
+
+    failed = sum(1 for _, error in results if error)
+    busy = sum(seconds for seconds, _ in results)
+    elapsed = time.perf_counter() - start
+    print(f"\n{len(results) - failed} of {len(results)} files formatted in {elapsed:.2f}s "
+          f"({busy:.2f}s of processing across workers), {failed} failed.")
+    return 1 if failed else 0
+
+# Function to merge the input files into one CTRL-R import (see merge.py) and print the result.
+def run_merge(args, input_files, options, cache_dir, state_path, log_path):
+    start = time.perf_counter()
+    cache = InputCache(cache_dir) if cache_dir else None
+    state = ImportState(state_path) if state_path else None
+    try:
+        rows, changes, skipped = merge_files(input_files, args.merge, options, args.format_setting, cache, state,
+                                             log_path=log_path, dump_dir=args.profile_dir, workers=args.workers)
+    except ProcessingError as e:
+        print(f"FAILED merging {len(input_files)} files ({time.perf_counter() - start:.2f}s): {e}")
+        return 1
+    finally:
+        if state is not None:
+            state.close()
+    for message in skipped:
+        print(f"SKIP   {message}")
+    summary = f", {changes.summary()}" if changes is not None else ""
+    merged = len(input_files) - len(skipped)
+    print(f"OK     {merged} files merged -> {args.merge} ({rows} rows{summary}, {time.perf_counter() - start:.2f}s)"
+          + (f", {len(skipped)} skipped" if skipped else ""))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+# Benchmark of the general formatting step. Compares the original general_formatting(), which walks
+# every cell of a written worksheet, with the widths and shared styles that writer.py works out from
+# the DataFrame, and shows how much formatting adds on top of the streaming write.
+#
+#   python benchmarks/bench_formatting.py --scales 10 100
+
+import argparse
+import os
+import tempfile
+
+import openpyxl
+
+from common import GMETRIX_CSV, scale_rows, timed
+
+import legacy
+from processing import DEFAULT_OPTIONS, process_file
+from writer import column_widths, save_file
+
+NO_FORMATTING = dict(DEFAULT_OPTIONS, word_wrap=0, center_text=0, autosize_columns=0, resize_columns=0)
+
+# Function to write the data into an in-memory worksheet the way the original save step did, so the
+# original general_formatting() can be timed on its own.
+def filled_worksheet(df):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in df.itertuples(index=False, name=None):
+        ws.append(row)
+    return ws
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the original general_formatting() with the up-front formatting in writer.py.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 100], help="Row multipliers to apply to the Gmetrix sample.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        df = process_file(GMETRIX_CSV, "General Formatting", DEFAULT_OPTIONS)
+        output = os.path.join(tmp_dir, "out.xlsx")
+
+        print(f"{'rows':>8} {'original formatting':>20} {'column widths':>14} {'write unformatted':>18} {'write formatted':>16} {'overhead':>9}")
+        for scale in args.scales:
+            scaled = scale_rows(df, scale)
+            ws = filled_worksheet(scaled)
+            _, original = timed(legacy.general_formatting, ws, DEFAULT_OPTIONS)
+            _, widths = timed(column_widths, scaled, DEFAULT_OPTIONS)
+            _, unformatted = timed(save_file, scaled, output, "General Formatting", NO_FORMATTING)
+            _, formatted = timed(save_file, scaled, output, "General Formatting", DEFAULT_OPTIONS)
+            print(f"{len(scaled):>8} {original:>19.2f}s {widths:>13.2f}s {unformatted:>17.2f}s {formatted:>15.2f}s "
+                  f"{(formatted - unformatted) / unformatted:>8.0%}")
+
+if __name__ == "__main__":
+    main()
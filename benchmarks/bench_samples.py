@@ -0,0 +1,130 @@
+# Throughput benchmark of the whole pipeline on the files in Sample Files. Each sample is scaled up to
+# 10, 100 and 1000 times its rows (see scale_file in common.py) and processed and saved the way the GUI
+# and batch mode do it. Each run happens in a fresh process, so its peak memory is its own, and the time,
+# rows and peak memory of every stage (see STAGES in settings.py) are recorded with the same profiler as
+# the timing log. With --trace-memory the memory allocated during each stage is traced as well, which
+# slows the runs down.
+#
+# --json writes the results as a report that a later run can be compared with, for example before and
+# after a change:
+#   python benchmarks/bench_samples.py --json before.json
+#   python benchmarks/bench_samples.py --json after.json --compare before.json
+#   python benchmarks/bench_samples.py --scales 10 100 --case northstar-ctrlr
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from common import (GMETRIX_CSV, GMETRIX_CTRLR, NFR_DATA, NFR_RAW, NORTHSTAR_DATA, NORTHSTAR_RAW, ROOT, scale_file,
+                    timed, with_generated_samples, write_gmetrix_ctrlr_sample)
+
+from processing import DEFAULT_OPTIONS
+from profiler import StageProfiler
+from readers import excel_engine_name
+from worker import save_formatted_file
+
+# The cases, as (name, input, format setting, output extension).
+CASES = [
+    ("gmetrix-raw", GMETRIX_CSV, "Gmetrix Raw Data", ".xlsx"),
+    ("gmetrix-ctrlr", GMETRIX_CTRLR, "Gmetrix for CTRL-R Import", ".xlsx"),
+    ("nfr-ctrlr", NFR_RAW, "NFR Rise Up for CTRL-R Import", ".xlsx"),
+    ("nfr-ctrlr-data", NFR_DATA, "NFR Rise Up for CTRL-R Import", ".xlsx"),
+    ("northstar-ctrlr", NORTHSTAR_RAW, "NorthStar for CTRL-R Import", ".xlsx"),
+    ("northstar-ctrlr-data", NORTHSTAR_DATA, "NorthStar for CTRL-R Import", ".xlsx"),
+    ("northstar-ctrlr-csv", NORTHSTAR_RAW, "NorthStar for CTRL-R Import", ".csv"),
+    ("general-gmetrix-csv", GMETRIX_CSV, "General Formatting", ".xlsx"),
+    ("general-nfr-data", NFR_DATA, "General Formatting", ".xlsx"),
+    ("general-northstar", NORTHSTAR_RAW, "General Formatting", ".xlsx"),
+    ("general-northstar-data", NORTHSTAR_DATA, "General Formatting", ".xlsx"),
+]
+
+# Function to process and save one scaled input. Runs in its own process. Returns the rows written, the
+# seconds taken and the stages recorded by the profiler.
+def run_one(input_path, output_path, format_setting, trace_memory):
+    profiler = StageProfiler(trace_memory=trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        (rows, _), seconds = timed(save_formatted_file, input_path, output_path, format_setting, DEFAULT_OPTIONS,
+                                   progress=profiler)
+    finally:
+        profiler.finish_stage()
+        if trace_memory:
+            tracemalloc.stop()
+    return rows, seconds, profiler.stages
+
+# Function to find the commit being benchmarked, if the project is a git checkout.
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Function to print the results of this run next to those of an earlier report.
+def compare(results, baseline_path):
+    with open(baseline_path, encoding='utf-8') as file:
+        baseline = json.load(file)
+    before = {(result["case"], result["scale"]): result for result in baseline["results"]}
+    print(f"\nCompared with {baseline_path} (commit {baseline.get('commit')}):")
+    print(f"{'case':<22} {'scale':>6} {'before s':>9} {'after s':>9} {'speedup':>8} {'before MB':>10} {'after MB':>9}")
+    for result in results:
+        old = before.get((result["case"], result["scale"]))
+        if old is None:
+            continue
+        print(f"{result['case']:<22} {result['scale']:>6} {old['seconds']:>9.3f} {result['seconds']:>9.3f} "
+              f"{old['seconds'] / result['seconds']:>7.2f}x {old['peak_rss_mb'] or 0:>10.1f} {result['peak_rss_mb'] or 0:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each stage of processing the scaled-up sample files.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 100, 1000], help="Row multipliers to apply to each sample.")
+    parser.add_argument('--case', action='append', help="Only run the named case. Can be given more than once.")
+    parser.add_argument('--trace-memory', action='store_true', help="Trace the memory allocated in each stage (slower).")
+    parser.add_argument('--json', help="Write the results to this file as JSON.")
+    parser.add_argument('--compare', help="A report written by --json to compare the results with.")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'case':<22} {'scale':>6} {'rows':>9} {'seconds':>9} {'rows/s':>10} {'peak MB':>8}  stages")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generated = {GMETRIX_CTRLR: write_gmetrix_ctrlr_sample(os.path.join(tmp_dir, "Gmetrix CTRL-R export.xlsx"))}
+        for name, input_path, format_setting, extension in CASES:
+            if args.case and name not in args.case:
+                continue
+            input_path = with_generated_samples([input_path], generated)[0]
+            for scale in args.scales:
+                scaled = scale_file(input_path, scale, os.path.join(tmp_dir, f"{name}-{scale}{os.path.splitext(input_path)[1]}"))
+                output_path = os.path.join(tmp_dir, f"{name}-{scale}-output{extension}")
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    rows, seconds, stages = executor.submit(run_one, scaled, output_path, format_setting,
+                                                            args.trace_memory).result()
+                peaks = [stage["peak_rss_mb"] for stage in stages if stage.get("peak_rss_mb") is not None]
+                result = {
+                    "case": name, "format_setting": format_setting, "scale": scale, "output": extension,
+                    "input_bytes": os.path.getsize(scaled), "rows": rows, "seconds": round(seconds, 4),
+                    "rows_per_second": round(rows / seconds) if seconds else None,
+                    "peak_rss_mb": max(peaks) if peaks else None, "stages": stages,
+                }
+                results.append(result)
+                stage_times = " ".join(f"{stage['stage']} {stage['seconds']:.2f}s" for stage in stages)
+                print(f"{name:<22} {scale:>6} {rows:>9} {seconds:>8.3f}s {result['rows_per_second'] or 0:>10} "
+                      f"{result['peak_rss_mb'] or 0:>8.1f}  {stage_times}")
+                os.remove(scaled)
+
+    if args.json:
+        report = {
+            "commit": git_commit(), "host": platform.node(), "python": platform.python_version(),
+            "excel_engine": excel_engine_name(), "scales": args.scales, "results": results,
+        }
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=1)
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
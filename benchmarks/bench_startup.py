@@ -0,0 +1,72 @@
+# Benchmark of the time it takes the application to start. Each run launches a fresh copy of the
+# application with the STARTUP_TIMING environment variable set, which makes it print its own timings once
+# the window is drawn and close again (see report_startup_timing in main.py):
+#   launch to paint  seconds from launching the process to the window being drawn, including starting
+#                    Python (and unpacking the PyInstaller executable)
+#   import           seconds from main.py starting to run until its imports are done
+#   first paint      seconds from main.py starting to run until the window is drawn
+#   warm up          seconds from main.py starting to run until pandas and openpyxl are loaded
+# The time to import the processing modules on their own is measured as well. The median of the runs is
+# reported, and --json prints the results as one line of JSON so they can be compared across releases.
+#
+#   python benchmarks/bench_startup.py --runs 5
+#   python benchmarks/bench_startup.py --exe dist/main.exe --json
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from common import ROOT
+
+# Function to launch the application once and return its startup timings.
+def measure_gui(command):
+    env = dict(os.environ, STARTUP_TIMING="1")
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    launch_to_paint = time.perf_counter() - start
+    _, errors = process.communicate()
+    if not line:
+        raise RuntimeError(f"The application did not report its startup time:\n{errors.strip()}")
+    timings = json.loads(line)
+    timings["launch_to_paint"] = launch_to_paint
+    return timings
+
+# Function to time importing a module in a fresh Python process.
+def measure_import(module):
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(result.stdout)
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how long the application takes to start and show its window.")
+    parser.add_argument('--runs', type=int, default=5, help="Number of launches. The median is reported.")
+    parser.add_argument('--exe', help="Measure a built executable instead of python main.py.")
+    parser.add_argument('--json', action='store_true', help="Print the results as one line of JSON.")
+    args = parser.parse_args()
+
+    command = [args.exe] if args.exe else [sys.executable, os.path.join(ROOT, "main.py")]
+    results = {}
+    for module in ("main", "processing", "worker"):
+        results[f"import {module}"] = statistics.median(measure_import(module) for _ in range(args.runs))
+    try:
+        runs = [measure_gui(command) for _ in range(args.runs)]
+    except RuntimeError as e:
+        # Without a display (for example on a build server) only the imports can be measured.
+        print(e, file=sys.stderr)
+    else:
+        for key in ("launch_to_paint", "import", "first_paint", "warm_up"):
+            results[key] = statistics.median(run[key] for run in runs)
+
+    if args.json:
+        print(json.dumps({name: round(seconds, 4) for name, seconds in results.items()}))
+    else:
+        for name, seconds in results.items():
+            print(f"{name.replace('_', ' '):>18} {seconds:>8.3f}s")
+
+if __name__ == "__main__":
+    main()
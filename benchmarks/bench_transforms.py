@@ -0,0 +1,107 @@
+# Benchmark of the CTRL-R transforms on synthetic inputs. Each format gets a generated input with the
+# columns its import reads (1,000,000 rows by default, always made from the same seed). The steps of the
+# transform (see CompiledProfile in processing.py) are timed one at a time: selecting the rows, working out
+# the measures, the status and exam score, building the output and, within that, the students' names. The
+# time of the whole transform is reported next to the original apply() based transform. The outputs of the
+# two are compared, so a change that alters the import file is caught as well as one that slows it.
+#
+#   python benchmarks/bench_transforms.py --rows 1000000
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from common import timed
+
+import legacy
+from processing import COMPILED_PROFILES, DEFAULT_OPTIONS, student_names
+
+FIRST_NAMES = np.array(['Ana', 'Ben', ' Carla', 'Dev ', 'Eli', 'Fatima', 'Grace', 'Hugo', 'Ivy', 'Jon'], dtype=object)
+LAST_NAMES = np.array(['Smith', 'Lee ', 'Garcia', ' Nguyen', 'Brown', 'Khan', 'Lopez', 'Kim'], dtype=object)
+COURSES = np.array([f"Course {number}" for number in range(25)], dtype=object)
+NORTHSTAR_CERTIFICATES = 14
+
+# Function to pick n values from a list of choices.
+def pick(rng, choices, n):
+    return choices[rng.integers(0, len(choices), n)]
+
+# Function to generate a Gmetrix CTRL-R input: scores as text with a percent sign and some missing names.
+def gmetrix_input(rng, n):
+    first_names = pick(rng, FIRST_NAMES, n)
+    first_names[rng.random(n) < 0.01] = np.nan
+    return pd.DataFrame({
+        'Course Name': pick(rng, COURSES, n),
+        'First Name': first_names,
+        'Last Name': pick(rng, LAST_NAMES, n),
+        'Score': pd.Series(rng.integers(0, 101, n)).astype(str) + '%',
+    })
+
+# Function to generate an NFR Rise Up input with a mix of exam and lesson rows.
+def nfr_input(rng, n):
+    return pd.DataFrame({
+        'FIRST NAME': pick(rng, FIRST_NAMES, n),
+        'LAST NAME': pick(rng, LAST_NAMES, n),
+        'COURSE/EXAM': pick(rng, COURSES, n),
+        'TYPE': pick(rng, np.array(['Exam', 'Exam Retest', 'Lesson'], dtype=object), n),
+        'STATUS': pick(rng, np.array(['Passed', 'Failed', 'PASSED', 'In Progress'], dtype=object), n),
+        'COMPLETED': pd.Timestamp('2024-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D'),
+    })
+
+# Function to generate a NorthStar input where each certificate column is 1 or empty.
+def northstar_input(rng, n):
+    df = pd.DataFrame({'First Name': pick(rng, FIRST_NAMES, n), 'Last Name': pick(rng, LAST_NAMES, n)})
+    for number in range(NORTHSTAR_CERTIFICATES):
+        df[f"Module {number} Certificate Earned"] = np.where(rng.random(n) < 0.4, 1, np.nan)
+    return df
+
+# The format settings with their input generator and original transform. The current transform is the
+# format's compiled profile (see processing.py).
+FORMATS = [
+    ("Gmetrix for CTRL-R Import", gmetrix_input, legacy.process_ctrlr_import),
+    ("NFR Rise Up for CTRL-R Import", nfr_input, legacy.process_nfr_ctrlr_import),
+    ("NorthStar for CTRL-R Import", northstar_input, legacy.process_northstar_ctrlr_import),
+]
+
+# Function to return the result and the fastest time of several calls of func(df, *args). The original
+# transforms add columns to their input, so every call gets its own copy, made outside the timing. Series
+# such as the name columns are copied the same way.
+def best_of(repeat, func, df, *args):
+    best = None
+    for _ in range(repeat):
+        result, seconds = timed(func, df.copy(), *args)
+        best = seconds if best is None else min(best, seconds)
+    return result, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the CTRL-R transforms on synthetic inputs against the original apply() versions.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Rows in each generated input.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs of each stage. The fastest is reported.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the generated inputs.")
+    args = parser.parse_args()
+
+    options = dict(DEFAULT_OPTIONS)
+    print(f"{'format':<32} {'rows':>9} {'filter':>8} {'measure':>8} {'status':>8} {'output':>8} {'names':>8} "
+          f"{'transform':>10} {'original':>9} {'speedup':>8}  output")
+    for format_setting, make_input, original in FORMATS:
+        compiled = COMPILED_PROFILES[format_setting]
+        df, generate = timed(make_input, np.random.default_rng(args.seed), args.rows)
+        selected, select = best_of(args.repeat, compiled.select_rows, df)
+        measures, measure = best_of(args.repeat, compiled.measure, selected)
+        outcome, status = best_of(args.repeat, compiled.outcome, selected, measures, options)
+        _, output = best_of(args.repeat, compiled.build_output, selected, outcome)
+        _, names = best_of(args.repeat, student_names, selected[compiled.profile.first_name],
+                           selected[compiled.profile.last_name])
+        result, transform = best_of(args.repeat, compiled.run, df, options)
+        expected, before = best_of(args.repeat, original, df, options)
+        try:
+            pd.testing.assert_frame_equal(result, expected)
+            check = "same"
+        except AssertionError:
+            check = "DIFFERENT"
+        print(f"{format_setting:<32} {len(df):>9} {select:>7.3f}s {measure:>7.3f}s {status:>7.3f}s {output:>7.3f}s "
+              f"{names:>7.3f}s {transform:>9.3f}s {before:>8.3f}s {before / transform:>7.1f}x  {check} "
+              f"(input generated in {generate:.1f}s)")
+
+if __name__ == "__main__":
+    main()
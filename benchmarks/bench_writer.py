@@ -0,0 +1,60 @@
+# Benchmark of the save step: the original per-cell writer against the streaming writer in writer.py.
+# Scales the sample files up and reports rows written per second. The CTRL-R import is also saved as
+# each output type (Excel, CSV and Parquet) to compare their save times.
+#
+#   python benchmarks/bench_writer.py --scales 10 100
+
+import argparse
+import os
+import tempfile
+
+from common import GMETRIX_CSV, NORTHSTAR_RAW, scale_rows, timed
+
+import legacy
+from processing import DEFAULT_OPTIONS, ProcessingError, process_file
+from writer import save_file
+
+# Function to load the processed sample DataFrames that the benchmark writes out.
+def load_cases():
+    return [
+        ("General Formatting (Gmetrix CSV)", "General Formatting",
+         process_file(GMETRIX_CSV, "General Formatting", DEFAULT_OPTIONS)),
+        ("NorthStar for CTRL-R Import", "NorthStar for CTRL-R Import",
+         process_file(NORTHSTAR_RAW, "NorthStar for CTRL-R Import", DEFAULT_OPTIONS)),
+    ]
+
+# Function to time saving a CTRL-R import as each output type. Parquet is left out without pyarrow.
+def compare_output_types(format_setting, df, scales, tmp_dir):
+    print(f"\n{'output type':<34} {'rows':>8} {'seconds':>9} {'rows/s':>11}")
+    for scale in scales:
+        scaled = scale_rows(df, scale)
+        for extension in (".xlsx", ".csv", ".parquet"):
+            try:
+                _, seconds = timed(save_file, scaled, os.path.join(tmp_dir, "out" + extension), format_setting, DEFAULT_OPTIONS)
+            except ProcessingError as e:
+                print(f"{extension:<34} {len(scaled):>8} skipped: {e}")
+                continue
+            print(f"{extension:<34} {len(scaled):>8} {seconds:>8.3f}s {len(scaled) / seconds:>11.0f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the original per-cell writer with the streaming writer.")
+    parser.add_argument('--scales', type=int, nargs='+', default=[10, 100], help="Row multipliers to apply to each sample.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print(f"{'case':<34} {'rows':>8} {'cols':>5} {'before rows/s':>14} {'after rows/s':>13} {'speedup':>8}")
+        cases = load_cases()
+        for name, format_setting, df in cases:
+            for scale in args.scales:
+                scaled = scale_rows(df, scale)
+                output = os.path.join(tmp_dir, "out.xlsx")
+                _, before = timed(legacy.save_file, scaled, output, format_setting, DEFAULT_OPTIONS)
+                _, after = timed(save_file, scaled, output, format_setting, DEFAULT_OPTIONS)
+                rows = len(scaled)
+                print(f"{name:<34} {rows:>8} {len(scaled.columns):>5} {rows / before:>14.0f} {rows / after:>13.0f} {before / after:>7.1f}x")
+        # The last case is the CTRL-R import, the only one that can be saved as CSV or Parquet.
+        _, format_setting, df = cases[-1]
+        compare_output_types(format_setting, df, args.scales, tmp_dir)
+
+if __name__ == "__main__":
+    main()
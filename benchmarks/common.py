@@ -0,0 +1,106 @@
+# Shared helpers for the benchmarks. Run the benchmarks from the repository root, e.g.
+#   python benchmarks/bench_writer.py
+
+import csv
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import openpyxl
+import pandas as pd
+
+SAMPLE_DIR = os.path.join(ROOT, "Sample Files")
+GMETRIX_CSV = os.path.join(SAMPLE_DIR, "Gmextrix StudentProgressReport - RAW DATA.csv")
+NFR_DATA = os.path.join(SAMPLE_DIR, "NRF Rise Up - Customer Service - DATA.xlsx")
+NFR_RAW = os.path.join(SAMPLE_DIR, "NRF Rise Up - Customer Service - RAW DATA.xlsx")
+NORTHSTAR_RAW = os.path.join(SAMPLE_DIR, "Northstar Digital Literacy - RAW DATA.xlsx")
+NORTHSTAR_DATA = os.path.join(SAMPLE_DIR, "Northstar Digital Literacy Student Report - DATA.xlsx")
+SAMPLE_FILES = [GMETRIX_CSV, NFR_DATA, NFR_RAW, NORTHSTAR_RAW, NORTHSTAR_DATA]
+# Sample Files has no Gmetrix export for the CTRL-R import, so one is made by write_gmetrix_ctrlr_sample.
+# Lists of inputs use GMETRIX_CTRLR to stand for it (see with_generated_samples).
+GMETRIX_CTRLR = "gmetrix ctrl-r sample"
+# Stands for the sheet with runs of blank rows made by write_blank_rows_sample.
+BLANK_ROWS = "blank rows sample"
+GMETRIX_CTRLR_ROWS = 200
+
+# Function to repeat the rows of a DataFrame to make a larger input of the same shape.
+def scale_rows(df, factor):
+    return pd.concat([df] * factor, ignore_index=True)
+
+# Function to time a call. Returns the result and the elapsed seconds.
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+# Function to write a Gmetrix export for the CTRL-R import, with the same rows every time: names with
+# stray spaces, a few missing first names, and scores as text with a percent sign.
+def write_gmetrix_ctrlr_sample(path, rows=GMETRIX_CTRLR_ROWS):
+    first_names = ['Ana', 'Ben', ' Carla', 'Dev ', 'Eli', 'Fatima', 'Grace', 'Hugo', 'Ivy', 'Jon']
+    last_names = ['Smith', 'Lee ', 'Garcia', ' Nguyen', 'Brown', 'Khan', 'Lopez', 'Kim']
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(['Course Name', 'First Name', 'Last Name', 'Email', 'Score'])
+    for number in range(rows):
+        first_name = None if number % 50 == 7 else first_names[number % len(first_names)]
+        last_name = last_names[(number // len(first_names)) % len(last_names)]
+        ws.append([f"IC3 GS6 Level {number % 3 + 1}", first_name, last_name, f"student{number}@example.org",
+                   f"{(number * 37) % 101}%"])
+    wb.save(path)
+    return path
+
+# Function to write an Excel sheet with runs of blank rows between its rows of data, longer than a chunk
+# of the regression check, and rows of different widths.
+def write_blank_rows_sample(path):
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for row in range(1, 6):
+        ws.append([f"Student {row}", row * 10, "x" * row])
+    for row in range(30, 33):
+        ws.cell(row=row, column=1, value=f"Student {row}")
+        ws.cell(row=row, column=2, value=row * 2.5)
+        ws.cell(row=row, column=4, value="after the gap")
+    ws.cell(row=60, column=2, value=7)
+    wb.save(path)
+    return path
+
+# Function to replace the stand-ins for generated samples (such as GMETRIX_CTRLR) in a list of inputs with
+# their paths. generated maps each stand-in to the path of its sample.
+def with_generated_samples(inputs, generated):
+    return [generated.get(path, path) for path in inputs]
+
+# Function to write a copy of an input file with its data repeated factor times. A CSV file is repeated
+# whole, so a Gmetrix report becomes several reports one after another. An Excel file keeps its header row
+# once and repeats the rows below it.
+def scale_file(input_path, factor, output_path):
+    if input_path.lower().endswith('.csv'):
+        with open(input_path, 'r', encoding='utf-8-sig', newline='') as file:
+            rows = list(csv.reader(file))
+        with open(output_path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file)
+            for _ in range(factor):
+                writer.writerows(rows)
+        return output_path
+
+    source = openpyxl.load_workbook(input_path, read_only=True, data_only=True)
+    try:
+        sheet = source.worksheets[0]
+        sheet.reset_dimensions()
+        rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+    finally:
+        source.close()
+    # Blank rows at the end of the sheet are not repeated.
+    while len(rows) > 1 and all(value is None for value in rows[-1]):
+        rows.pop()
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(rows[0])
+    for _ in range(factor):
+        for row in rows[1:]:
+            ws.append(row)
+    wb.save(output_path)
+    return output_path
@@ -0,0 +1,178 @@
+# Regression check of the output files. Every format setting is run on the files in Sample Files through
+# the same steps the GUI and batch mode use, and each output is compared with its golden copy in
+# benchmarks/golden. An Excel output is compared by its cell values and their types, the column widths and
+# the styles of the cells, so a change that alters what the user sees is caught even though the bytes of
+# two saves of the same workbook differ. A change that is meant to alter the output is recorded by running
+# the check with --update and committing the new golden files with it.
+#
+#   python benchmarks/regression.py
+#   python benchmarks/regression.py --update
+#   python benchmarks/regression.py --case general-gmetrix-csv
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+
+import openpyxl
+
+from common import (BLANK_ROWS, GMETRIX_CSV, GMETRIX_CTRLR, NFR_DATA, NFR_RAW, NORTHSTAR_DATA, NORTHSTAR_RAW, ROOT,
+                    with_generated_samples, write_blank_rows_sample, write_gmetrix_ctrlr_sample)
+
+from chunked import save_chunked
+from merge import merge_files
+from processing import DEFAULT_OPTIONS
+from worker import save_formatted_file
+
+GOLDEN_DIR = os.path.join(ROOT, "benchmarks", "golden")
+PLAIN = dict(DEFAULT_OPTIONS, word_wrap=0, center_text=0, autosize_columns=0, resize_columns=1, column_width=25)
+
+# The cases, as (name, how the output is made, inputs, format setting, options, output extension). Cases
+# with the same golden name must give the same output, such as a file formatted whole and in chunks.
+CASES = [
+    ("gmetrix-raw-descending", "save", [GMETRIX_CSV], "Gmetrix Raw Data", DEFAULT_OPTIONS, ".xlsx"),
+    ("gmetrix-raw-ascending", "save", [GMETRIX_CSV], "Gmetrix Raw Data", dict(DEFAULT_OPTIONS, sort_order="Ascending"), ".xlsx"),
+    ("gmetrix-raw-unsorted", "save", [GMETRIX_CSV], "Gmetrix Raw Data", dict(DEFAULT_OPTIONS, sort_order="Unsorted"), ".xlsx"),
+    ("gmetrix-ctrlr", "save", [GMETRIX_CTRLR], "Gmetrix for CTRL-R Import", DEFAULT_OPTIONS, ".xlsx"),
+    ("gmetrix-ctrlr-85", "save", [GMETRIX_CTRLR], "Gmetrix for CTRL-R Import", dict(DEFAULT_OPTIONS, passing_percentage=85), ".csv"),
+    ("nfr-ctrlr-data", "save", [NFR_DATA], "NFR Rise Up for CTRL-R Import", DEFAULT_OPTIONS, ".xlsx"),
+    ("nfr-ctrlr-raw", "save", [NFR_RAW], "NFR Rise Up for CTRL-R Import", DEFAULT_OPTIONS, ".xlsx"),
+    ("nfr-ctrlr-raw-csv", "save", [NFR_RAW], "NFR Rise Up for CTRL-R Import", DEFAULT_OPTIONS, ".csv"),
+    ("northstar-ctrlr-raw", "save", [NORTHSTAR_RAW], "NorthStar for CTRL-R Import", DEFAULT_OPTIONS, ".xlsx"),
+    ("northstar-ctrlr-data-6", "save", [NORTHSTAR_DATA], "NorthStar for CTRL-R Import",
+     dict(DEFAULT_OPTIONS, northstar_passing_certificates=6), ".xlsx"),
+    ("general-gmetrix-csv", "save", [GMETRIX_CSV], "General Formatting", DEFAULT_OPTIONS, ".xlsx"),
+    ("general-gmetrix-csv", "chunked", [GMETRIX_CSV], "General Formatting", DEFAULT_OPTIONS, ".xlsx"),
+    ("general-nfr-data", "save", [NFR_DATA], "General Formatting", DEFAULT_OPTIONS, ".xlsx"),
+    ("general-nfr-raw", "save", [NFR_RAW], "General Formatting", PLAIN, ".xlsx"),
+    ("general-northstar-raw", "save", [NORTHSTAR_RAW], "General Formatting", DEFAULT_OPTIONS, ".xlsx"),
+    ("general-northstar-raw", "chunked", [NORTHSTAR_RAW], "General Formatting", DEFAULT_OPTIONS, ".xlsx"),
+    ("general-northstar-data", "save", [NORTHSTAR_DATA], "General Formatting", PLAIN, ".xlsx"),
+    ("general-blank-rows", "save", [BLANK_ROWS], "General Formatting", DEFAULT_OPTIONS, ".xlsx"),
+    ("general-blank-rows", "chunked", [BLANK_ROWS], "General Formatting", DEFAULT_OPTIONS, ".xlsx"),
+    ("merged-ctrlr", "merge", [NFR_RAW, NORTHSTAR_RAW, GMETRIX_CTRLR], None, DEFAULT_OPTIONS, ".xlsx"),
+]
+# Rows per chunk for the chunked cases, small so the samples are split into many chunks.
+CHUNK_ROWS = 7
+
+# Function to turn a cell value into something JSON keeps the type of. Whole floats are marked, since
+# JSON would read 85.0 back as the same number as 85.
+def cell_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return {"float": value}
+    elif isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return {type(value).__name__: value.isoformat()}
+    return value
+
+# Function to describe an Excel output by what the user sees: the values, the column widths and the style
+# of the cells. Empty cells at the end of a row are left out.
+def excel_snapshot(path):
+    wb = openpyxl.load_workbook(path)
+    ws = wb.worksheets[0]
+    rows = []
+    styles = {}
+    for row in ws.iter_rows():
+        values = [cell_value(cell.value) for cell in row]
+        while values and values[-1] is None:
+            values.pop()
+        rows.append(values)
+        for cell in row:
+            if cell.value is not None:
+                styles[cell.style] = styles.get(cell.style, 0) + 1
+    widths = {letter: dimension.width for letter, dimension in sorted(ws.column_dimensions.items())
+              if dimension.width is not None}
+    return {"widths": widths, "styles": styles, "rows": rows}
+
+# Function to describe an output file for comparing with its golden copy.
+def snapshot(path):
+    if path.endswith('.xlsx'):
+        return excel_snapshot(path)
+    with open(path, 'r', encoding='utf-8') as file:
+        return {"lines": file.read().splitlines()}
+
+# Function to make the output of a case and return its snapshot.
+def run_case(how, inputs, format_setting, options, extension, tmp_dir):
+    output_path = os.path.join(tmp_dir, "output" + extension)
+    if how == "save":
+        save_formatted_file(inputs[0], output_path, format_setting, options)
+    elif how == "chunked":
+        save_chunked(inputs[0], output_path, options, chunk_rows=CHUNK_ROWS)
+    else:
+        merge_files(inputs, output_path, options, format_setting, workers=1)
+    return snapshot(output_path)
+
+# Function to write a golden copy with one row or line of the output per line, so a change to the output
+# shows up in a diff as the rows that changed.
+def write_golden(path, result):
+    parts = []
+    for key, value in result.items():
+        if key in ("rows", "lines"):
+            parts.append(f'"{key}": [\n' + ",\n".join(json.dumps(item) for item in value) + "\n]")
+        else:
+            parts.append(f'"{key}": {json.dumps(value)}')
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write("{" + ",\n".join(parts) + "}\n")
+
+# Function to describe the first difference between a snapshot and its golden copy.
+def first_difference(golden, result):
+    for key in ("widths", "styles", "lines"):
+        if golden.get(key) != result.get(key):
+            return f"{key} differ: expected {json.dumps(golden.get(key))[:200]}, got {json.dumps(result.get(key))[:200]}"
+    golden_rows, result_rows = golden.get("rows", []), result.get("rows", [])
+    for number, (expected, got) in enumerate(zip(golden_rows, result_rows), 1):
+        if json.dumps(expected) != json.dumps(got):
+            return f"row {number} differs: expected {json.dumps(expected)[:200]}, got {json.dumps(got)[:200]}"
+    return f"expected {len(golden_rows)} rows, got {len(result_rows)}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the outputs for the sample files with their golden copies.")
+    parser.add_argument('--update', action='store_true', help="Write the current outputs as the golden copies.")
+    parser.add_argument('--case', action='append', help="Only run the named case. Can be given more than once.")
+    args = parser.parse_args()
+
+    failures = 0
+    written = set()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        generated = {
+            GMETRIX_CTRLR: write_gmetrix_ctrlr_sample(os.path.join(tmp_dir, "Gmetrix CTRL-R export.xlsx")),
+            BLANK_ROWS: write_blank_rows_sample(os.path.join(tmp_dir, "Blank rows.xlsx")),
+        }
+        for name, how, inputs, format_setting, options, extension in CASES:
+            if args.case and name not in args.case:
+                continue
+            inputs = with_generated_samples(inputs, generated)
+            label = f"{name} ({how})"
+            try:
+                result = run_case(how, inputs, format_setting, options, extension, tmp_dir)
+            except Exception as e:
+                print(f"FAIL  {label}: {type(e).__name__}: {e}")
+                failures += 1
+                continue
+
+            golden_path = os.path.join(GOLDEN_DIR, name + ".json")
+            # The first case of a name writes the golden copy, and any others with the name are checked against it.
+            if args.update and name not in written:
+                os.makedirs(GOLDEN_DIR, exist_ok=True)
+                write_golden(golden_path, result)
+                written.add(name)
+                print(f"WROTE {label}")
+                continue
+            if not os.path.exists(golden_path):
+                print(f"FAIL  {label}: no golden copy, run with --update to write it")
+                failures += 1
+                continue
+            with open(golden_path, 'r', encoding='utf-8') as file:
+                golden = json.load(file)
+            if json.dumps(golden, sort_keys=True) == json.dumps(result, sort_keys=True):
+                print(f"ok    {label}")
+            else:
+                print(f"FAIL  {label}: {first_difference(golden, result)}")
+                failures += 1
+
+    print(f"\n{failures} of the cases failed." if failures else "\nAll cases match their golden copies.")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
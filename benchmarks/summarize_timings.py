@@ -0,0 +1,62 @@
+# Summary of the timing logs written by the GUI and batch mode (see profiler.py). Takes any number of log
+# files, for example copied from several machines, and prints the median and 90th percentile time of each
+# stage per format setting, with the largest peak memory seen.
+#
+#   python benchmarks/summarize_timings.py timings-frontdesk.jsonl timings-lab.jsonl
+
+import argparse
+import json
+import statistics
+from collections import defaultdict
+
+from common import ROOT  # noqa: F401  (puts the project on the import path)
+
+from profiler import default_log_path
+from settings import STAGES
+
+# Function to read the runs from the log files, skipping lines that are not valid JSON.
+def read_runs(paths):
+    runs = []
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    runs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return runs
+
+# Function to return the value below which the given fraction of the values fall.
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the stage timings of saved files.")
+    parser.add_argument('logs', nargs='*', help="Timing log files. Defaults to this machine's log.")
+    args = parser.parse_args()
+
+    runs = read_runs(args.logs or [default_log_path()])
+    seconds = defaultdict(list)
+    peaks = defaultdict(float)
+    statuses = defaultdict(lambda: defaultdict(int))
+    for run in runs:
+        statuses[run["format_setting"]][run["status"]] += 1
+        if run["status"] != "ok":
+            continue
+        for stage in run["stages"]:
+            key = (run["format_setting"], stage["stage"])
+            seconds[key].append(stage["seconds"])
+            peaks[key] = max(peaks[key], stage.get("peak_rss_mb") or 0)
+
+    for format_setting, counts in sorted(statuses.items()):
+        print(f"\n{format_setting} ({', '.join(f'{count} {status}' for status, count in sorted(counts.items()))})")
+        print(f"  {'stage':<10} {'runs':>5} {'median':>9} {'90th pct':>9} {'peak memory':>12}")
+        for stage in STAGES:
+            values = seconds.get((format_setting, stage))
+            if values:
+                print(f"  {stage:<10} {len(values):>5} {statistics.median(values):>8.3f}s {percentile(values, 0.9):>8.3f}s "
+                      f"{peaks[(format_setting, stage)]:>9.1f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# On-disk cache of parsed input files. Saving the same file again (for example after changing the passing
+# percentage or the sort order) reuses the DataFrame read the first time instead of reading and parsing
+# the file again, so only the transform and write steps run.
+#
+# Entries are keyed by a hash of the file's contents, its modification time, the format setting and the
+# columns its profile reads (which decide how the file is read). They are pickled DataFrames, and the least recently used entries are
+# deleted when the cache grows past its size limit.
+
+import hashlib
+import logging
+import os
+import pickle
+import sys
+
+from profiles import PROFILES
+
+logger = logging.getLogger(__name__)
+
+# Change this when the way input files are read changes, so entries from older versions are not used.
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Function to find the directory the application keeps its local data in for the current user.
+def default_data_dir():
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'PyramidCDCGradeFormatter')
+
+# Function to find the default cache directory for the current user.
+def default_cache_dir():
+    return os.path.join(default_data_dir(), 'inputs')
+
+class InputCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+
+    # Function to build the cache key of an input file read with a format setting.
+    def key(self, file_path, format_setting):
+        content_hash = hashlib.sha256()
+        with open(file_path, 'rb') as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+                content_hash.update(block)
+        mtime = os.stat(file_path).st_mtime_ns
+        key = f"{CACHE_VERSION}|{content_hash.hexdigest()}|{mtime}|{format_setting}|{PROFILES[format_setting].read_key()}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    # Function to return the DataFrame for an input file from the cache, or read it with read() and
+    # store it if the file has not been read with this format setting before.
+    def load(self, file_path, format_setting, read):
+        key = self.key(file_path, format_setting)
+        df = self.get(key)
+        if df is not None:
+            logger.info("Input cache hit: %s (%s)", os.path.basename(file_path), format_setting)
+            return df
+        logger.info("Input cache miss: %s (%s)", os.path.basename(file_path), format_setting)
+        df = read()
+        self.put(key, df)
+        return df
+
+    # Function to load a cached DataFrame. Returns None if there is no usable entry for the key.
+    def get(self, key):
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                df = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # A damaged or outdated entry is dropped and the file is read again.
+            logger.warning("Input cache entry %s could not be loaded (%s), reading the file again", key, e)
+            self.remove(path)
+            return None
+        # Touch the entry so eviction sees it as recently used. Another process may have evicted it since
+        # it was loaded, which does not matter.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return df
+
+    # Function to store a DataFrame in the cache, then evict old entries if the cache is over its limit.
+    def put(self, key, df):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(key)
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as file:
+                pickle.dump(df, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, path)
+        except OSError as e:
+            # The cache only saves time, so failing to write it is not an error for the user.
+            logger.warning("Could not write the input cache entry %s: %s", key, e)
+            self.remove(temp_path)
+            return
+        self.evict()
+
+    # Function to delete the least recently used entries until the cache is within its size limit. Other
+    # processes can use the cache at the same time, so entries can disappear while this runs.
+    def evict(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            if name.endswith('.pkl'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self.remove(os.path.join(self.directory, name))
+            logger.info("Input cache evicted %s", name)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,212 @@
+# Chunked mode for large files with no transform, such as General Formatting. Reading a whole sheet into a
+# DataFrame before writing it needs several copies of the data in memory, which large exports do not fit
+# in on small office PCs. Instead, the input is streamed CHUNK_ROWS rows at a time, twice:
+#   1. The first pass keeps running totals for each column: how many values it has, whether they are all
+#      numbers (and whole numbers), and the length of its longest text, for autosizing.
+#   2. The second pass converts each chunk the same way the whole file would have been converted and
+#      appends its rows to a write-only workbook (see writer.py), which writes them to disk as it goes.
+# Only one chunk is held in memory at a time, so the memory used stays the same however big the file is.
+# The mode is picked automatically for files over CHUNKED_MIN_BYTES (see use_chunked).
+
+import os
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from processing import (CSV_CHUNK_ROWS, ProcessingCancelled, ProcessingError, csv_row_chunks, parse_rows,
+                        report_progress, resolve_options)
+from profiles import PROFILES
+from readers import convert_cell, openpyxl_rows
+from writer import append_rows, general_formatting, widths_from_lengths
+
+CHUNK_ROWS = CSV_CHUNK_ROWS
+# The file size, by extension, above which a file is processed in chunks. Excel files are compressed, so
+# a smaller file holds as much data as a larger CSV file. Old .xls files cannot be streamed.
+CHUNKED_MIN_BYTES = {'.csv': 50 * 2 ** 20, '.xlsx': 10 * 2 ** 20, '.xlsm': 10 * 2 ** 20}
+# The text pd.read_excel reads as a missing value by default.
+NA_VALUES = ['', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+             '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null']
+
+# Function to decide whether a file is processed in chunks: its format setting keeps the data as it is
+# and the file is over the size limit for its type.
+def use_chunked(input_path, format_setting, min_bytes=None):
+    if format_setting not in PROFILES or PROFILES[format_setting].transform != "none":
+        return False
+    extension = os.path.splitext(input_path)[1].lower()
+    if extension not in CHUNKED_MIN_BYTES:
+        return False
+    limit = CHUNKED_MIN_BYTES[extension] if min_bytes is None else min_bytes
+    return os.path.getsize(input_path) >= limit
+
+# Function to stream the rows of an input file in chunks of DataFrames with the missing values masked,
+# the same as the whole file is read (see read_ragged_csv and pd.read_excel). The values are kept as they
+# are, and their types are worked out for the whole file by ColumnStats.
+def read_chunks(input_path, chunk_rows=CHUNK_ROWS):
+    if input_path.lower().endswith('.csv'):
+        for rows in csv_row_chunks(input_path, chunk_rows):
+            yield parse_rows(rows, dtype=object)
+        return
+    # openpyxl is used even when python-calamine is installed, because calamine loads the whole sheet.
+    rows = openpyxl_rows(input_path)
+    try:
+        while True:
+            chunk = []
+            for row in rows:
+                chunk.append([convert_cell(value) for value in row])
+                if len(chunk) == chunk_rows:
+                    break
+            if not chunk:
+                break
+            df = pd.DataFrame(chunk, dtype=object)
+            yield df.mask(df.isna() | df.isin(NA_VALUES))
+    finally:
+        rows.close()
+
+# Running totals of the columns of a file read a chunk at a time. They are enough to convert every chunk
+# the way the whole file would have been converted and to autosize the columns.
+class ColumnStats:
+    def __init__(self):
+        self.rows = 0
+        # The number of rows up to the last one with a value. Blank rows at the end of an Excel sheet are
+        # left out, like pd.read_excel does.
+        self.rows_with_data = 0
+        self.values = []
+        self.numeric = []
+        self.whole = []
+        self.text_length = []
+        self.float_length = []
+        self.int_length = []
+        # The first row each column is missing a value in, or None. Missing values count as the text "nan"
+        # when a whole DataFrame is autosized, but only if they are in the rows that are kept.
+        self.first_missing = []
+
+    @property
+    def columns(self):
+        return len(self.values)
+
+    # Function to add the values of a chunk to the totals.
+    def add(self, chunk):
+        for _ in range(self.columns, len(chunk.columns)):
+            self.values.append(0)
+            self.numeric.append(True)
+            self.whole.append(True)
+            self.text_length.append(0)
+            self.float_length.append(0)
+            self.int_length.append(0)
+            # A column first seen in this chunk is missing in all the rows before it.
+            self.first_missing.append(0 if self.rows else None)
+        has_data = chunk.notna().any(axis=1).to_numpy()
+        if has_data.any():
+            self.rows_with_data = self.rows + int(has_data.nonzero()[0][-1]) + 1
+
+        for position in range(self.columns):
+            if position < len(chunk.columns):
+                column = chunk[chunk.columns[position]]
+                missing = column.isna().to_numpy()
+                present = column[~missing]
+            else:
+                # A chunk narrower than the file is missing the values of the columns it does not have.
+                missing = np.ones(len(chunk), dtype=bool)
+                present = None
+            if self.first_missing[position] is None and missing.any():
+                self.first_missing[position] = self.rows + int(missing.nonzero()[0][0])
+            if present is None or present.empty:
+                continue
+            self.values[position] += len(present)
+            self.text_length[position] = max(self.text_length[position], present.astype(str).str.len().max())
+            if not self.numeric[position]:
+                continue
+            numbers = pd.to_numeric(present, errors='coerce')
+            if numbers.isna().any():
+                self.numeric[position] = False
+                continue
+            if numbers.dtype.kind not in 'iu':
+                self.whole[position] = False
+            self.float_length[position] = max(self.float_length[position], numbers.astype(float).astype(str).str.len().max())
+            if self.whole[position]:
+                self.int_length[position] = max(self.int_length[position], numbers.astype(str).str.len().max())
+        self.rows += len(chunk)
+
+    # Function to work out the type each column is given: "int" or "float" for columns that only hold
+    # numbers, otherwise "text". A column of whole numbers with missing values is "float", like in pandas.
+    def column_types(self, rows):
+        types = []
+        for position in range(self.columns):
+            if not self.numeric[position]:
+                types.append("text")
+            elif self.whole[position] and self.values[position] == rows:
+                types.append("int")
+            else:
+                types.append("float")
+        return types
+
+    # Function to find the length of the longest text of each column once it has its type.
+    def max_lengths(self, types, rows):
+        lengths = []
+        for position, column_type in enumerate(types):
+            first_missing = self.first_missing[position]
+            missing = first_missing is not None and first_missing < rows
+            if column_type == "int":
+                lengths.append(self.int_length[position])
+            elif column_type == "float":
+                lengths.append(max(self.float_length[position], 3 if missing else 0))
+            else:
+                lengths.append(max(self.text_length[position], 3 if missing else 0))
+        return lengths
+
+# Function to give the columns of a chunk the types worked out for the whole file. Chunks narrower than the
+# file are padded with missing values.
+def convert_chunk(chunk, types):
+    chunk = chunk.reindex(columns=range(len(types)))
+    for position, column_type in enumerate(types):
+        if column_type != "text":
+            numbers = pd.to_numeric(chunk[position])
+            chunk[position] = numbers.astype(float) if column_type == "float" else numbers
+    return chunk
+
+# Function to format a large file a chunk at a time and save it as an Excel file, with the same formatting
+# options as General Formatting. Returns the number of rows written.
+def save_chunked(input_path, output_file_path, options=None, progress=None, chunk_rows=CHUNK_ROWS):
+    options = resolve_options(options)
+
+    # 1: Read the file once to find the types and the longest text of the columns.
+    report_progress(progress, "read")
+    stats = ColumnStats()
+    try:
+        for chunk in read_chunks(input_path, chunk_rows):
+            stats.add(chunk)
+            # The size of the file is not known in rows yet, but reporting each chunk lets a save be cancelled.
+            report_progress(progress, "read")
+    except ProcessingCancelled:
+        raise
+    except Exception as e:
+        raise ProcessingError(f"Failed to process the file\n{e}") from e
+    if stats.rows == 0 and input_path.lower().endswith('.csv'):
+        raise ProcessingError("The CSV file is empty.")
+    rows = stats.rows if input_path.lower().endswith('.csv') else stats.rows_with_data
+    shape = (rows, stats.columns)
+
+    # 2: Work out the column widths and the cell style before any rows are written.
+    report_progress(progress, "format", shape=shape)
+    types = stats.column_types(rows)
+    lengths = stats.max_lengths(types, rows) if options['autosize_columns'] == 1 else None
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    cell_style = general_formatting(ws, widths_from_lengths(lengths, stats.columns, options), options)
+
+    # 3: Read the file again, converting and appending each chunk as it is read.
+    report_progress(progress, "write", shape=shape)
+    written = 0
+    for chunk in read_chunks(input_path, chunk_rows):
+        if written + len(chunk) > rows:
+            chunk = chunk.iloc[:rows - written]
+        # A chunk of blank rows has no columns, but its rows are still written, padded by convert_chunk.
+        if len(chunk) == 0:
+            break
+        append_rows(ws, convert_chunk(chunk, types), cell_style, progress, max(rows, 1), written)
+        written += len(chunk)
+
+    report_progress(progress, "save", shape=shape)
+    wb.save(output_file_path)
+    return rows
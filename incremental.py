@@ -0,0 +1,104 @@
+# Incremental CTRL-R import. The CTRL-R formats are usually run on the same cumulative export every week,
+# so most of the grades in the import file are the same as last time. This keeps a small SQLite database
+# with a hash of every student's row per format setting, keyed by 'Student Course Name', and leaves only
+# the rows that are new or have changed since the last saved import.
+#
+# The state is only updated after the import file has been written (see ImportState.commit), so a failed
+# save does not lose any changes.
+
+import os
+import sqlite3
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+from cache import default_data_dir
+
+KEY_COLUMN = 'Student Course Name'
+# The columns compared between runs. A change to any of them makes the row part of the next import.
+COMPARED_COLUMNS = ['Students', 'Course Name', 'Status', 'Exam Score', 'Certificates Earned', 'Course Completion Date']
+STATE_FILE_NAME = 'ctrlr_import_state.sqlite'
+
+# Function to find the default location of the import state database.
+def default_state_path():
+    return os.path.join(default_data_dir(), STATE_FILE_NAME)
+
+# The rows of an import that are new or changed, with the counts and hashes needed to record them.
+class ImportChanges:
+    def __init__(self, format_setting, rows, hashes, added, changed, unchanged):
+        self.format_setting = format_setting
+        self.rows = rows
+        self.hashes = hashes
+        self.added = added
+        self.changed = changed
+        self.unchanged = unchanged
+
+    # Function to describe the counts for a message or log line.
+    def summary(self):
+        return f"{self.added} added, {self.changed} changed, {self.unchanged} unchanged"
+
+# Function to write a compared value as text, so a row hashes the same whatever the dtype of its columns.
+# The same merged column can be datetime64 one week and object the next (a NorthStar or Gmetrix file adds
+# '' dates), or hold 85.0 instead of 85, so missing values, dates and whole numbers are each written one way.
+def comparable_text(value):
+    if isinstance(value, str):
+        return value
+    if pd.isna(value):
+        return ''
+    if isinstance(value, (date, np.datetime64)):
+        return pd.Timestamp(value).isoformat()
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+class ImportState:
+    def __init__(self, path=None):
+        self.path = path or default_state_path()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Batch mode can open the database from several worker processes, so wait for locks instead of failing.
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS rows ("
+            " format_setting TEXT NOT NULL,"
+            " student_course TEXT NOT NULL,"
+            " row_hash INTEGER NOT NULL,"
+            " updated TEXT NOT NULL,"
+            " PRIMARY KEY (format_setting, student_course))")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    # Function to compare a processed CTRL-R DataFrame with the last saved import of the same format setting.
+    # Returns an ImportChanges holding the rows that are new or changed.
+    def diff(self, df, format_setting):
+        # 1: Hash the compared columns of every row. Students that appear more than once keep their last row,
+        # which is the one CTRL-R would end up with.
+        latest = df.drop_duplicates(subset=[KEY_COLUMN], keep='last')
+        compared = pd.DataFrame({column: latest[column].map(comparable_text).astype(object)
+                                 for column in COMPARED_COLUMNS})
+        hashes = pd.util.hash_pandas_object(compared, index=False).astype('int64')
+        hashes.index = latest[KEY_COLUMN].to_numpy()
+
+        # 2: Look up the hashes saved by the last import and compare.
+        saved = pd.Series(dict(self.connection.execute(
+            "SELECT student_course, row_hash FROM rows WHERE format_setting = ?", (format_setting,))), dtype='int64')
+        is_new = ~hashes.index.isin(saved.index)
+        is_changed = ~is_new
+        is_changed[~is_new] = saved.reindex(hashes.index[~is_new]).to_numpy() != hashes.to_numpy()[~is_new]
+        emit = is_new | is_changed
+
+        return ImportChanges(format_setting, latest[emit].reset_index(drop=True), hashes[emit],
+                             added=int(is_new.sum()), changed=int(is_changed.sum()),
+                             unchanged=int(len(latest) - emit.sum()))
+
+    # Function to record the rows of an import once the import file has been saved.
+    def commit(self, changes):
+        updated = datetime.now().isoformat(timespec='seconds')
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO rows (format_setting, student_course, row_hash, updated) VALUES (?, ?, ?, ?)",
+                ((changes.format_setting, key, int(row_hash), updated) for key, row_hash in changes.hashes.items()))
@@ -1,20 +1,36 @@
 # Kade Hennacy 9/4/2024
 
 # To best understand this script, read these comments in order starting at 1. Comment #2 is at the bottom.
-
-# 1: Import necessary libraries.
+# Comments 9 to 28 describe the processing steps, which live in processing.py and writer.py so they can run
+# without the GUI.
+
+# 1: Import necessary libraries. pandas and openpyxl take a few seconds to load, so they are not imported
+# here. The window is shown first and they are loaded in the background (see warm_up).
+import time
+STARTED = time.perf_counter()
+import json
+import logging
 import os
-import re
+import queue
+import sys
+import threading
 import tkinter as tk
 from tkinter import filedialog, messagebox, Label, Button, Frame, IntVar, Checkbutton
-from tkinter.ttk import Combobox, Spinbox
-import pandas as pd
-import openpyxl
-from openpyxl.styles import Alignment, Font
+from tkinter.ttk import Combobox, Progressbar, Spinbox
+from profiles import PROFILE_ERROR, PROFILES
+from settings import CTRLR_FILE_TYPES, CTRLR_FORMATS, EXCEL_FILE_TYPES, FORMAT_SETTINGS, INPUT_FILE_TYPES, STAGES
 
 # 3: Initialize global variables that will be used across functions.
-df = None
 file_path = ""
+# The output paths of the saves that are queued or running, in the order they were queued.
+queued_jobs = []
+# The background worker that saves files (see worker.py), started by the first save.
+save_worker = None
+warm_up_thread = None
+POLL_MILLISECONDS = 100
+# The text shown next to the progress bar for each stage.
+STAGE_NAMES = {"read": "Reading", "sanitize": "Cleaning up", "transform": "Processing",
+               "format": "Formatting", "write": "Writing", "save": "Saving"}
 
 # 4: Define the main functions that handle file loading, processing, and saving.
 
@@ -23,11 +39,8 @@ def load_file():
     global file_path
     format_setting = format_combo.get()
 
-    # 5: Set the acceptable file types based on the selected format setting.
-    if format_setting == "Gmetrix Raw Data":
-        file_type = [("CSV files", "*.csv")]
-    else:
-        file_type = [("Excel files", "*.xlsx;*.xls"), ("CSV files", "*.csv")]
+    # 5: Set the acceptable file types based on the input type of the format setting's profile.
+    file_type = INPUT_FILE_TYPES[PROFILES[format_setting].input]
 
     # 6: Open a file dialog for the user to select a file.
     file_path = filedialog.askopenfilename(filetypes=file_type)
@@ -35,345 +48,175 @@ def load_file():
         filename = os.path.basename(file_path)
         file_label.config(text=f"Loaded file: {filename}", font=('Helvetica', 10, 'bold'))
 
-# Function to save the processed file when the "Save Formatted File" button is pressed.
+# Function to queue the loaded file for saving when the "Save Formatted File" button is pressed.
 def save_file():
-    # 7: Process the file based on the selected format setting.
-    process_file()
-    if 'df' not in globals() or df is None:
-        messagebox.showerror("Error", "No processed data available. Please load and process a file first.")
+    # 7: Check that a file has been loaded.
+    if not file_path:
+        messagebox.showerror("Error", "No file loaded. Please load an input file first.")
         return
 
-    # 8: Open a file dialog for the user to specify the output file path.
-    output_file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=[("Excel files", "*.xlsx")])
-    if not output_file_path:
-        return
-
-    # 9: Create a new workbook and worksheet using openpyxl.
-    wb = openpyxl.Workbook()
-    ws = wb.active
-
-    format_setting = format_combo.get()
-
-    # 10: Write headers if the format setting requires them.
-    if format_setting in ["Gmetrix for CTRL-R Import", "NFR Rise Up for CTRL-R Import", "NorthStar for CTRL-R Import"]:
-        header_font = Font(bold=True)
-        header_alignment = Alignment(horizontal='center', vertical='center')
-        for col_idx, col_name in enumerate(df.columns, 1):
-            cell = ws.cell(row=1, column=col_idx, value=col_name)
-            cell.font = header_font
-            cell.alignment = header_alignment
-        start_row = 2  # Data starts from the second row
-    else:
-        start_row = 1  # Data starts from the first row
-
-    # 11: Write data to the worksheet.
-    for row_idx, row in enumerate(df.itertuples(index=False, name=None), start_row):
-        for col_idx, value in enumerate(row, 1):
-            ws.cell(row=row_idx, column=col_idx, value=value)
-
-    # 12: Apply general formatting if needed.
-    if "for CTRL-R Import" not in format_setting:
-        general_formatting(ws)
-
-    # 13: Save the workbook to the specified output file path.
-    wb.save(output_file_path)
-    messagebox.showinfo("Success", f"Data processed and saved to {output_file_path}")
-
-# Function to process the file based on the selected format setting.
-def process_file():
-    global df, file_path
+    # 8: Open a file dialog for the user to specify the output file path. CTRL-R imports can also be
+    # saved as CSV or Parquet.
     format_setting = format_combo.get()
-
-    # 14: Read the input file into a pandas DataFrame.
-    try:
-        if format_setting in ["Gmetrix for CTRL-R Import", "NFR Rise Up for CTRL-R Import", "NorthStar for CTRL-R Import"]:
-            df = pd.read_excel(file_path)
-        else:
-            if file_path.endswith('.csv'):
-                sanitize_csv()
-                df = pd.read_csv(file_path, header=None)
-            else:
-                df = pd.read_excel(file_path, header=None)
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to process the file\n{e}")
-        return
-
-    # 15: Call the appropriate processing function based on the format setting.
-    if format_setting == "Gmetrix Raw Data":
-        process_gmetrix()
-    elif format_setting == "Gmetrix for CTRL-R Import":
-        process_ctrlr_import()
-    elif format_setting == "NFR Rise Up for CTRL-R Import":
-        process_nfr_ctrlr_import()
-    elif format_setting == "NorthStar for CTRL-R Import":
-        process_northstar_ctrlr_import()
-
-# 16: Define functions specific to each format setting.
-
-# Function to process Gmetrix Raw Data.
-def process_gmetrix():
-    global df
-    if df is None:
-        messagebox.showerror("Error", "No file loaded. Please load a CSV file first.")
-        return
-
-    # 17: Remove columns containing "Minutes Spent" or "Score".
-    columns_to_remove = []
-    for col in df.columns:
-        if df[col].apply(lambda x: str(x).strip().lower() in ["minutes spent", "score"]).any():
-            columns_to_remove.append(col)
-    df.drop(columns_to_remove, axis=1, inplace=True)
-
-    # 18: Sort data if required.
-    sort_order = sort_order_combo.get()
-    if sort_order != "Unsorted":
-        ascending_order = sort_order == "Ascending"
-        post_assessment_cols = []
-
-        for col in df.columns:
-            if df[col].apply(lambda x: "Post-Assessment" in str(x)).any():
-                post_assessment_cols.append(col)
-
-        for post_assessment_col in post_assessment_cols:
-            test_score_rows = df[df[post_assessment_col] == 'Test Score'].index
-
-            for test_score_row in test_score_rows:
-                next_blank_row = df[df.index > test_score_row][post_assessment_col].first_valid_index()
-                end_row = df[df.index >= next_blank_row][post_assessment_col].isna().idxmax() if pd.notna(next_blank_row) else len(df)
-
-                scores_data = df.iloc[test_score_row + 1:end_row].copy()
-                scores_data[post_assessment_col] = scores_data[post_assessment_col].str.rstrip('%').apply(pd.to_numeric, errors='coerce')
-                scores_data.dropna(subset=[post_assessment_col], inplace=True)
-                sorted_data = scores_data.sort_values(by=post_assessment_col, ascending=ascending_order)
-                sorted_data[post_assessment_col] = sorted_data[post_assessment_col].apply(lambda x: f"{x}%")
-                df.iloc[test_score_row + 1:end_row] = sorted_data
-
-# Function to process data for CTRL-R Import from Gmetrix.
-def process_ctrlr_import():
-    global df
-    if df is None:
-        messagebox.showerror("Error", "No file loaded. Please load an Excel file first.")
-        return
-
-    required_columns = ['Course Name', 'First Name', 'Last Name', 'Score']
-    if not all(col in df.columns for col in required_columns):
-        messagebox.showerror("Error", "Input file does not contain the required columns.")
-        return
-
-    df = df.dropna(subset=['Course Name', 'First Name', 'Last Name'])
-
-    # 19: Combine 'First Name' and 'Last Name' to create 'Students' and 'Student Course Name'.
-    df['Students'] = df['First Name'].astype(str).str.strip() + ' ' + df['Last Name'].astype(str).str.strip()
-    df['Student Course Name'] = df['Students'] + ' - ' + df['Course Name'].astype(str).str.strip()
-
-    df['Score'] = df['Score'].astype(str).str.rstrip('%').astype(float)
-
-    passing_percentage = passing_percentage_var.get()
-    df['Status'] = df['Score'].apply(lambda x: 'Complete' if x >= passing_percentage else 'In Progress')
-    df['Exam Score'] = df['Score']
-    df['Certificates Earned'] = ''
-    df['Course Completion Date'] = ''
-
-    # 20: Reorder columns for the output.
-    df_output = df[['Students', 'Course Name', 'Status', 'Exam Score',
-                    'Certificates Earned', 'Course Completion Date', 'Student Course Name']]
-    df = df_output
-
-# Function to process data for CTRL-R Import from NFR Rise Up.
-def process_nfr_ctrlr_import():
-    global df
-    if df is None:
-        messagebox.showerror("Error", "No file loaded. Please load an Excel file first.")
-        return
-
-    required_columns = ['FIRST NAME', 'LAST NAME', 'COURSE/EXAM', 'TYPE', 'STATUS', 'COMPLETED']
-    if not all(col in df.columns for col in required_columns):
-        messagebox.showerror("Error", "Input file does not contain the required columns.")
-        return
-
-    # 21: Filter and process data.
-    df = df[df['TYPE'].isin(['Exam', 'Exam Retest'])]
-    df['Students'] = df['FIRST NAME'].astype(str).str.strip() + ' ' + df['LAST NAME'].astype(str).str.strip()
-    df['Student Course Name'] = df['Students'] + ' - ' + df['COURSE/EXAM'].astype(str).str.strip()
-    df['Status'] = df['STATUS'].apply(lambda x: 'Complete' if x.upper() == 'PASSED' else 'In Progress')
-    df['Exam Score'] = df['STATUS'].apply(lambda x: 'PASS' if x.upper() == 'PASSED' else 'FAIL')
-    df['Course Name'] = df['COURSE/EXAM']
-    df['Course Completion Date'] = df['COMPLETED']
-    df['Certificates Earned'] = ''
-
-    df_output = df[['Students', 'Course Name', 'Status', 'Exam Score',
-                    'Certificates Earned', 'Course Completion Date', 'Student Course Name']]
-    df = df_output
-
-# Function to process data for CTRL-R Import from NorthStar.
-def process_northstar_ctrlr_import():
-    global df
-    if df is None:
-        messagebox.showerror("Error", "No file loaded. Please load an Excel file first.")
+    file_types = CTRLR_FILE_TYPES if format_setting in CTRLR_FORMATS else EXCEL_FILE_TYPES
+    output_file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=file_types)
+    if not output_file_path:
         return
 
-    required_columns = ['First Name', 'Last Name']
-    if not all(col in df.columns for col in required_columns):
-        messagebox.showerror("Error", "Input file does not contain 'First Name' and 'Last Name' columns.")
+    # 9 - 24: Read, process and write the file on the background worker (see worker.py), so the window
+    # stays responsive. Saves queued while another is running are done in turn. With "Only New or Changed
+    # Rows" selected, a CTRL-R import keeps only the rows that differ from the last saved import (see
+    # incremental.py).
+    from worker import SaveJob
+    incremental = format_setting in CTRLR_FORMATS and incremental_var.get() == 1
+    queue_job(SaveJob(file_path, output_file_path, format_setting, get_options(), incremental))
+
+# Function to merge several CTRL-R exports into one import file when the "Merge CTRL-R Files" button is
+# pressed. The exports can be from any of the CTRL-R platforms, which is worked out from their columns.
+def merge_exports():
+    input_paths = filedialog.askopenfilenames(filetypes=INPUT_FILE_TYPES["any"])
+    if not input_paths:
         return
-
-    # 22: Combine 'First Name' and 'Last Name' to create 'Students' and 'Student Course Name'.
-    df['Students'] = df['First Name'].astype(str).str.strip() + ' ' + df['Last Name'].astype(str).str.strip()
-    df['Course Name'] = 'Northstar Digital Literacy'
-    df['Student Course Name'] = df['Students'] + ' - ' + df['Course Name']
-
-    # 23: Identify 'Certificate Earned' columns and count total certificates.
-    certificate_columns = [col for col in df.columns if 'Certificate Earned' in col]
-    if not certificate_columns:
-        messagebox.showerror("Error", "No 'Certificate Earned' columns found in the input file.")
+    output_file_path = filedialog.asksaveasfilename(defaultextension=".xlsx", filetypes=CTRLR_FILE_TYPES)
+    if not output_file_path:
         return
 
-    df['Total Certificates'] = df[certificate_columns].apply(pd.to_numeric, errors='coerce').fillna(0).sum(axis=1)
-    df['Certificates Earned'] = df['Total Certificates'].astype(int)
-
-    # 24: Set 'Exam Score' and 'Status' based on total certificates.
-    passing_certificates = northstar_passing_certificates_var.get()
-    df['Exam Score'] = df['Total Certificates'].apply(lambda x: 'Passed' if x >= passing_certificates else 'Failed')
-    df['Status'] = df['Exam Score'].apply(lambda x: 'Complete' if x == 'Passed' else 'In Progress')
-    df['Course Completion Date'] = ''
-
-    df_output = df[['Students', 'Course Name', 'Status', 'Exam Score',
-                    'Certificates Earned', 'Course Completion Date', 'Student Course Name']]
-    df = df_output
-
-# Function to sanitize CSV files by ensuring equal number of commas in each row.
-def sanitize_csv():
-    global file_path
-    with open(file_path, 'r') as file:
-        lines = file.readlines()
-
-    max_commas = max(line.count(',') for line in lines)
-
-    adjusted_lines = []
-    for line in lines:
-        current_commas = line.count(',')
-        if current_commas < max_commas:
-            line = line.strip('\n') + ',' * (max_commas - current_commas) + '\n'
-        adjusted_lines.append(line)
-
-    with open(file_path, 'w') as file:
-        file.writelines(adjusted_lines)
-
-# Function to apply general formatting to the worksheet.
-def general_formatting(ws):
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-
-        for cell in col:
-            # 25: Apply word wrap if selected.
-            if word_wrap_var.get() == 1:
-                cell.alignment = Alignment(wrap_text=True)
-
-            # 26: Apply text centering if selected.
-            if center_text_var.get() == 1:
-                cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=cell.alignment.wrap_text)
-
-            # 27: Calculate maximum length for autosizing columns.
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-
-        # 28: Autosize or manually resize columns based on user selection.
-        if autosize_col_var.get() == 1:
-            ws.column_dimensions[column].width = max_length + 2
-        elif resize_col_var.get() == 1:
-            ws.column_dimensions[column].width = column_width_var.get()
-
-# 29: Set up the GUI using tkinter.
-
-# Initialize the main window.
-root = tk.Tk()
-root.title("Spreadsheet Formatter")
-root.geometry("900x400")
-
-# Create frames for organizing widgets.
-frame_top = Frame(root)
-frame_top.pack(pady=10)
-frame_sort = Frame(root)
-frame_sort.pack(pady=(10, 0))
-frame_bottom = Frame(root)
-frame_bottom.pack(pady=0)
-
-# 30: Add labels and instructions.
-file_label = Label(frame_bottom, wraplength=600, justify="left")
-file_label.pack(pady=10)
-
-instruction_text = "This program loads a spreadsheet and formats it according to the format setting."
-label_instructions = Label(frame_bottom, text=instruction_text, wraplength=600, justify="left")
-label_instructions.pack(pady=(30, 15))
-
-additional_instruction_label = Label(frame_bottom, wraplength=600, justify="left")
-additional_instruction_label.pack(pady=10)
-
-# 31: Create the format setting dropdown.
-format_setting_label = Label(frame_top, text="Format Setting")
-format_setting_label.pack(side=tk.LEFT, padx=10)
-
-format_combo = Combobox(frame_top, state="readonly", width=25)
-format_combo['values'] = ("Gmetrix Raw Data", "Gmetrix for CTRL-R Import",
-                          "NFR Rise Up for CTRL-R Import", "NorthStar for CTRL-R Import", "General Formatting")
-format_combo.current(1)
-format_combo.pack(side=tk.LEFT, padx=10)
-
-# 32: Create the sort order dropdown (only visible for certain settings).
-sort_order_label = Label(frame_sort, text="Sort Order")
-sort_order_combo = Combobox(frame_sort, state="readonly", width=15)
-sort_order_combo['values'] = ("Ascending", "Descending", "Unsorted")
-sort_order_combo.current(1)
-
-# 33: Create buttons for loading and saving files.
-load_button = Button(frame_top, text="Load Input File", command=load_file)
-load_button.pack(side=tk.LEFT, padx=10)
-
-save_button = Button(frame_top, text="Save Formatted File", command=save_file)
-save_button.pack(side=tk.LEFT, padx=10)
+    # The files are read and merged on the background worker (see merge.py and worker.py).
+    from worker import MergeJob
+    queue_job(MergeJob(list(input_paths), output_file_path, get_options(), incremental_var.get() == 1))
+
+# Function to hand a job to the background worker and show that it is queued.
+def queue_job(job):
+    get_save_worker().submit(job)
+    queued_jobs.append(job.output_path)
+    cancel_button.config(state=tk.NORMAL)
+    if len(queued_jobs) > 1:
+        progress_label.config(text=f"Queued {os.path.basename(job.output_path)} ({len(queued_jobs)} files waiting)")
+
+# Function to cancel the running save and any queued saves when the "Cancel" button is pressed.
+def cancel_saves():
+    if save_worker is not None:
+        save_worker.cancel()
+    progress_label.config(text="Cancelling...")
+
+# Function to show the messages from the background worker. Runs every POLL_MILLISECONDS on the Tk event loop.
+def poll_worker():
+    while save_worker is not None:
+        try:
+            message = save_worker.messages.get_nowait()
+        except queue.Empty:
+            break
+        kind, job = message[0], message[1]
+        name = os.path.basename(job.output_path)
+        if kind == "progress":
+            stage, fraction = message[2], message[3]
+            progress_bar['value'] = (STAGES.index(stage) + fraction) / len(STAGES) * 100
+            waiting = f", {len(queued_jobs) - 1} more queued" if len(queued_jobs) > 1 else ""
+            progress_label.config(text=f"{STAGE_NAMES[stage]} {name}{waiting}")
+            continue
+
+        queued_jobs.remove(job.output_path)
+        progress_bar['value'] = 0
+        if kind == "done":
+            changes = message[3]
+            progress_label.config(text=f"Saved {name}")
+            text = f"Data processed and saved to {job.output_path}"
+            if changes is not None:
+                text += f"\n{changes.summary()}"
+            skipped = getattr(job, 'skipped', None)
+            if skipped:
+                text += "\n\nThese files were skipped:\n" + "\n".join(skipped)
+            messagebox.showinfo("Success", text)
+        elif kind == "failed":
+            progress_label.config(text=f"Failed to save {name}")
+            messagebox.showerror("Error", message[2])
+        elif kind == "cancelled":
+            progress_label.config(text=f"Cancelled {name}")
+        if not queued_jobs:
+            cancel_button.config(state=tk.DISABLED)
+    root.after(POLL_MILLISECONDS, poll_worker)
+
+# Function to return the background worker, starting it on the first save. Importing it loads pandas and
+# openpyxl, which warm_up() has usually done by the time a file is saved.
+def get_save_worker():
+    global save_worker
+    if save_worker is None:
+        from cache import InputCache
+        from incremental import default_state_path
+        from profiler import DUMP_DIR_VARIABLE, default_log_path
+        from worker import SaveWorker
+        # Every save is added to the timing log. Setting PROFILE_DUMP_DIR also profiles each save (see profiler.py).
+        save_worker = SaveWorker(InputCache(), default_state_path(), default_log_path(),
+                                 os.environ.get(DUMP_DIR_VARIABLE) or None)
+    return save_worker
+
+# Function to load the processing modules, and with them pandas and openpyxl, on a background thread
+# once the window is shown.
+def start_warm_up():
+    global warm_up_thread
+    warm_up_thread = threading.Thread(target=warm_up, name="WarmUp", daemon=True)
+    warm_up_thread.start()
+
+def warm_up():
+    import worker  # noqa: F401
+
+# Function to print how long startup took, as a line of JSON with the seconds since main.py started to run:
+# when the imports were done, when the window was first drawn and when the background imports finished.
+# Used with the STARTUP_TIMING environment variable (see benchmarks/bench_startup.py), after which the
+# window is closed.
+def report_startup_timing(imported):
+    root.update()
+    first_paint = time.perf_counter()
+    warm_up_thread.join()
+    warmed_up = time.perf_counter()
+    print(json.dumps({"import": round(imported - STARTED, 4), "first_paint": round(first_paint - STARTED, 4),
+                      "warm_up": round(warmed_up - STARTED, 4)}), flush=True)
+    root.destroy()
+
+# Function to collect the current values of the formatting options from the UI.
+def get_options():
+    return {
+        'sort_order': sort_order_combo.get(),
+        'word_wrap': word_wrap_var.get(),
+        'center_text': center_text_var.get(),
+        'autosize_columns': autosize_col_var.get(),
+        'resize_columns': resize_col_var.get(),
+        'column_width': column_width_var.get(),
+        'passing_percentage': passing_percentage_var.get(),
+        'northstar_passing_certificates': northstar_passing_certificates_var.get(),
+    }
 
 # 34: Define functions to handle UI updates based on user interactions.
 
-# Function to update instructions and UI elements when the format setting changes.
+# Function to update instructions and UI elements when the format setting changes. The instructions and
+# the options shown come from the format setting's profile (see profiles.py).
 def update_instruction(event=None):
-    format_setting = format_combo.get()
-    if format_setting == "Gmetrix Raw Data":
-        additional_instruction_label.config(text="Gmetrix Raw Data - This setting takes a CSV Gmetrix student progress report as input. It removes the 'Minutes Spent' and 'Score' columns, sizes columns to 18, and centers and wraps all text, and outputs an XLSX file. To sort the rows by post-assessment score, select an option from the Sort Order dropdown. Descending places the highest scores at the top of the sheet.")
-        sort_order_label.grid(row=0, column=0, padx=(10, 2), sticky='e')
-        sort_order_combo.grid(row=0, column=1, padx=(2, 10), sticky='w')
-        # Show formatting options.
-        show_formatting_options()
-        passing_percentage_label.grid_remove()
-        passing_percentage_spin.grid_remove()
-        northstar_passing_certificates_label.grid_remove()
-        northstar_passing_certificates_spin.grid_remove()
-    elif format_setting == "General Formatting":
-        additional_instruction_label.config(text="General Formatting - This setting takes any CSV or XLSX file and sizes columns to 18 and centers and wraps text.")
-        sort_order_label.grid_remove()
-        sort_order_combo.grid_remove()
+    profile = PROFILES[format_combo.get()]
+    additional_instruction_label.config(text=profile.description)
+    sort_order_label.grid_remove()
+    sort_order_combo.grid_remove()
+    passing_percentage_label.grid_remove()
+    passing_percentage_spin.grid_remove()
+    northstar_passing_certificates_label.grid_remove()
+    northstar_passing_certificates_spin.grid_remove()
+    if not profile.is_ctrlr:
+        if profile.transform == "gmetrix report":
+            sort_order_label.grid(row=0, column=0, padx=(10, 2), sticky='e')
+            sort_order_combo.grid(row=0, column=1, padx=(2, 10), sticky='w')
         # Show formatting options.
         show_formatting_options()
-        passing_percentage_label.grid_remove()
-        passing_percentage_spin.grid_remove()
-        northstar_passing_certificates_label.grid_remove()
-        northstar_passing_certificates_spin.grid_remove()
-    elif format_setting == "Gmetrix for CTRL-R Import":
-        additional_instruction_label.config(text="Gmetrix for CTRL-R Import - This setting takes a CSV Gmetrix student progress report as input. It removes and combines columns to create a file compatible with the import feature on the CTRL-R All Student Grades report.")
-        hide_all_formatting_options()
+        incremental_check.grid_remove()
+        return
+
+    hide_all_formatting_options()
+    # Show the control of the option the profile's pass rule compares against.
+    if profile.pass_option == 'passing_percentage':
         passing_percentage_label.grid(row=0, column=0, padx=(10, 2), sticky='e')
         passing_percentage_spin.grid(row=0, column=1, padx=(2, 10), sticky='w')
-    elif format_setting == "NFR Rise Up for CTRL-R Import":
-        additional_instruction_label.config(text="NFR Rise Up for CTRL-R Import - This setting takes an Excel file exported from the NFR Rise Up platform and formats it for CTRL-R import. It processes Exam and Exam Retest entries, combines columns, and creates a compatible file.")
-        hide_all_formatting_options()
-    elif format_setting == "NorthStar for CTRL-R Import":
-        additional_instruction_label.config(text="NorthStar for CTRL-R Import - This setting processes a NorthStar exported Excel file. It counts the total 'Certificate Earned' columns per student, sets the 'Exam Score' to 'Passed' if the student has earned the specified number of certificates, and updates the 'Status' accordingly.")
-        hide_all_formatting_options()
+    elif profile.pass_option == 'northstar_passing_certificates':
         northstar_passing_certificates_label.grid(row=0, column=0, padx=(10, 2), sticky='e')
         northstar_passing_certificates_spin.grid(row=0, column=1, padx=(2, 10), sticky='w')
+    incremental_check.grid(row=0, column=2, padx=(10, 2), sticky='w')
 
 # Function to show formatting options.
 def show_formatting_options():
@@ -402,6 +245,7 @@ def hide_all_formatting_options():
     passing_percentage_spin.grid_remove()
     northstar_passing_certificates_label.grid_remove()
     northstar_passing_certificates_spin.grid_remove()
+    incremental_check.grid_remove()
 
 # Function to handle the 'Resize Columns' checkbutton.
 def handle_resize_checkbutton():
@@ -420,41 +264,142 @@ def handle_autosize_checkbutton():
         column_width_spin.grid_remove()
         px_label.grid_remove()
 
-# 35: Initialize variables for UI inputs.
-word_wrap_var = IntVar(value=1)
-center_text_var = IntVar(value=1)
-autosize_col_var = IntVar(value=1)
-resize_col_var = IntVar(value=0)
-column_width_var = IntVar(value=18)
-passing_percentage_var = IntVar(value=70)
-northstar_passing_certificates_var = IntVar(value=5)
-
-# 36: Create UI elements for formatting options.
-word_wrap_check = Checkbutton(frame_sort, text="Word Wrap", variable=word_wrap_var)
-center_text_check = Checkbutton(frame_sort, text="Center Text", variable=center_text_var)
-resize_col_check = Checkbutton(frame_sort, text="Resize Columns", variable=resize_col_var, command=handle_resize_checkbutton)
-autosize_col_check = Checkbutton(frame_sort, text="Autosize Columns", variable=autosize_col_var, command=handle_autosize_checkbutton)
-column_width_spin = Spinbox(frame_sort, from_=10, to=50, textvariable=column_width_var, width=5)
-px_label = Label(frame_sort, text="Points")
-passing_percentage_label = Label(frame_sort, text="Passing Percentage")
-passing_percentage_spin = Spinbox(frame_sort, from_=0, to=100, textvariable=passing_percentage_var, width=5)
-
-# New UI elements for NorthStar certificates needed to pass
-northstar_passing_certificates_label = Label(frame_sort, text="Certificates Needed to Pass")
-northstar_passing_certificates_spin = Spinbox(frame_sort, from_=0, to=100, textvariable=northstar_passing_certificates_var, width=5)
-
-# 37: Position the formatting options in the grid.
-word_wrap_check.grid(row=0, column=2, padx=(10, 2), sticky='w')
-center_text_check.grid(row=0, column=3, padx=(2, 2), sticky='w')
-autosize_col_check.grid(row=0, column=4, padx=(2, 2), sticky='w')
-resize_col_check.grid(row=0, column=5, padx=(2, 2), sticky='w')
-column_width_spin.grid(row=0, column=6, padx=(2, 2), sticky='w')
-px_label.grid(row=0, column=7, sticky='w')
-
-# 38: Bind events and initialize UI.
-format_combo.bind("<<ComboboxSelected>>", update_instruction)
-update_instruction()
-handle_resize_checkbutton()
-
-# 2: Start the event loop of the user interface.
-root.mainloop()
+# 29: Set up the GUI using tkinter. This only happens when the program is run, so importing this module
+# does not open a window, and the event loop is started separately (see comment 2).
+def build_gui():
+    global root, frame_top, frame_sort, frame_bottom, file_label, label_instructions, additional_instruction_label
+    global format_setting_label, format_combo, sort_order_label, sort_order_combo, load_button, save_button
+    global merge_button
+    global word_wrap_var, center_text_var, autosize_col_var, resize_col_var, column_width_var
+    global passing_percentage_var, northstar_passing_certificates_var
+    global word_wrap_check, center_text_check, resize_col_check, autosize_col_check, column_width_spin, px_label
+    global passing_percentage_label, passing_percentage_spin
+    global northstar_passing_certificates_label, northstar_passing_certificates_spin
+    global incremental_var, incremental_check
+    global frame_progress, progress_bar, progress_label, cancel_button
+
+    # Initialize the main window.
+    root = tk.Tk()
+    root.title("Spreadsheet Formatter")
+    root.geometry("900x450")
+
+    # Create frames for organizing widgets.
+    frame_top = Frame(root)
+    frame_top.pack(pady=10)
+    frame_sort = Frame(root)
+    frame_sort.pack(pady=(10, 0))
+    frame_progress = Frame(root)
+    frame_progress.pack(pady=(10, 0))
+    frame_bottom = Frame(root)
+    frame_bottom.pack(pady=0)
+
+    # 30: Add labels and instructions.
+    file_label = Label(frame_bottom, wraplength=600, justify="left")
+    file_label.pack(pady=10)
+
+    instruction_text = "This program loads a spreadsheet and formats it according to the format setting."
+    label_instructions = Label(frame_bottom, text=instruction_text, wraplength=600, justify="left")
+    label_instructions.pack(pady=(30, 15))
+
+    additional_instruction_label = Label(frame_bottom, wraplength=600, justify="left")
+    additional_instruction_label.pack(pady=10)
+
+    # 31: Create the format setting dropdown.
+    format_setting_label = Label(frame_top, text="Format Setting")
+    format_setting_label.pack(side=tk.LEFT, padx=10)
+
+    format_combo = Combobox(frame_top, state="readonly", width=25)
+    format_combo['values'] = FORMAT_SETTINGS
+    format_combo.current(1)
+    format_combo.pack(side=tk.LEFT, padx=10)
+
+    # 32: Create the sort order dropdown (only visible for certain settings).
+    sort_order_label = Label(frame_sort, text="Sort Order")
+    sort_order_combo = Combobox(frame_sort, state="readonly", width=15)
+    sort_order_combo['values'] = ("Ascending", "Descending", "Unsorted")
+    sort_order_combo.current(1)
+
+    # 33: Create buttons for loading and saving files.
+    load_button = Button(frame_top, text="Load Input File", command=load_file)
+    load_button.pack(side=tk.LEFT, padx=10)
+
+    save_button = Button(frame_top, text="Save Formatted File", command=save_file)
+    save_button.pack(side=tk.LEFT, padx=10)
+
+    merge_button = Button(frame_top, text="Merge CTRL-R Files", command=merge_exports)
+    merge_button.pack(side=tk.LEFT, padx=10)
+
+    # Progress of the save that is running, with a button to cancel it and any queued saves.
+    progress_bar = Progressbar(frame_progress, mode='determinate', length=300, maximum=100)
+    progress_bar.pack(side=tk.LEFT, padx=10)
+    cancel_button = Button(frame_progress, text="Cancel", command=cancel_saves, state=tk.DISABLED)
+    cancel_button.pack(side=tk.LEFT, padx=10)
+    progress_label = Label(frame_progress, width=50, anchor='w')
+    progress_label.pack(side=tk.LEFT, padx=10)
+
+    # 35: Initialize variables for UI inputs.
+    word_wrap_var = IntVar(value=1)
+    center_text_var = IntVar(value=1)
+    autosize_col_var = IntVar(value=1)
+    resize_col_var = IntVar(value=0)
+    column_width_var = IntVar(value=18)
+    passing_percentage_var = IntVar(value=70)
+    northstar_passing_certificates_var = IntVar(value=5)
+    incremental_var = IntVar(value=0)
+
+    # 36: Create UI elements for formatting options.
+    word_wrap_check = Checkbutton(frame_sort, text="Word Wrap", variable=word_wrap_var)
+    center_text_check = Checkbutton(frame_sort, text="Center Text", variable=center_text_var)
+    resize_col_check = Checkbutton(frame_sort, text="Resize Columns", variable=resize_col_var, command=handle_resize_checkbutton)
+    autosize_col_check = Checkbutton(frame_sort, text="Autosize Columns", variable=autosize_col_var, command=handle_autosize_checkbutton)
+    column_width_spin = Spinbox(frame_sort, from_=10, to=50, textvariable=column_width_var, width=5)
+    px_label = Label(frame_sort, text="Points")
+    passing_percentage_label = Label(frame_sort, text="Passing Percentage")
+    passing_percentage_spin = Spinbox(frame_sort, from_=0, to=100, textvariable=passing_percentage_var, width=5)
+
+    # New UI elements for NorthStar certificates needed to pass
+    northstar_passing_certificates_label = Label(frame_sort, text="Certificates Needed to Pass")
+    northstar_passing_certificates_spin = Spinbox(frame_sort, from_=0, to=100, textvariable=northstar_passing_certificates_var, width=5)
+
+    # Only write the CTRL-R rows that are new or changed since the last saved import.
+    incremental_check = Checkbutton(frame_sort, text="Only New or Changed Rows", variable=incremental_var)
+
+    # 37: Position the formatting options in the grid.
+    word_wrap_check.grid(row=0, column=2, padx=(10, 2), sticky='w')
+    center_text_check.grid(row=0, column=3, padx=(2, 2), sticky='w')
+    autosize_col_check.grid(row=0, column=4, padx=(2, 2), sticky='w')
+    resize_col_check.grid(row=0, column=5, padx=(2, 2), sticky='w')
+    column_width_spin.grid(row=0, column=6, padx=(2, 2), sticky='w')
+    px_label.grid(row=0, column=7, sticky='w')
+
+    # 38: Bind events and initialize UI.
+    format_combo.bind("<<ComboboxSelected>>", update_instruction)
+    update_instruction()
+    handle_resize_checkbutton()
+    root.after(POLL_MILLISECONDS, poll_worker)
+    root.after_idle(start_warm_up)
+    if PROFILE_ERROR is not None:
+        root.after_idle(show_profile_error)
+
+# Function to tell the user that the format profiles file could not be loaded, so only the built-in format
+# settings are in the dropdown.
+def show_profile_error():
+    messagebox.showerror("Format Profiles Error",
+                         f"{PROFILE_ERROR}\n\nOnly the built-in format settings are available until the file is fixed.")
+
+if __name__ == "__main__":
+    # Any command line arguments select the headless batch mode (see batch.py), otherwise open the GUI.
+    if len(sys.argv) > 1:
+        import multiprocessing
+        import batch
+        multiprocessing.freeze_support()
+        sys.exit(batch.main())
+    imported = time.perf_counter()
+    # Saving the same file again with different options reuses the parsed input (see cache.py).
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    build_gui()
+    if os.environ.get('STARTUP_TIMING'):
+        report_startup_timing(imported)
+    else:
+        # 2: Start the event loop of the user interface.
+        root.mainloop()
@@ -0,0 +1,134 @@
+# Merge mode. Combines many CTRL-R exports, from any mix of Gmetrix, NFR Rise Up and NorthStar, into one
+# CTRL-R import file. The files are read and processed at the same time in a pool of worker processes,
+# each with the processing of its own format setting, so every result already has the CTRL-R columns.
+# Students that appear in more than one file (or more than once in a file) keep their best row (see
+# best_rows), and the merged rows are written to a single workbook. Files that are not from any of the
+# platforms are skipped and reported, so one stray file does not stop the others from being merged.
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from cache import InputCache
+from processing import ProcessingError, process_file, report_progress
+from profiles import PROFILES
+from profiler import profile_run
+from readers import read_excel_header
+from settings import CTRLR_COLUMNS, CTRLR_FORMATS, MERGED_CTRLR_IMPORT
+from writer import save_file
+
+KEY_COLUMN = 'Student Course Name'
+# Exam scores given as text, ranked so that a pass beats a fail. A missing score ranks below both.
+TEXT_SCORES = {'PASS': 1, 'PASSED': 1, 'FAIL': 0, 'FAILED': 0}
+
+# Raised when the platform an export is from cannot be worked out. The merge skips the file.
+class UnknownPlatformError(ProcessingError):
+    pass
+
+# Function to work out which CTRL-R format an export is from by its column names, using the detect rules
+# of the format profiles (see profiles.py) in dropdown order.
+def detect_ctrlr_format(file_path):
+    try:
+        if file_path.lower().endswith('.csv'):
+            header = pd.read_csv(file_path, nrows=0, encoding='utf-8-sig').columns
+        else:
+            header = read_excel_header(file_path)
+        columns = [str(column) for column in header]
+    except Exception as e:
+        raise UnknownPlatformError(f"{os.path.basename(file_path)}: Failed to read the file\n{e}") from e
+    for format_setting in CTRLR_FORMATS:
+        detect = PROFILES[format_setting].detect
+        if not detect:
+            continue
+        if not all(column in columns for column in detect.get('columns', [])):
+            continue
+        if 'columns_containing' in detect and not any(detect['columns_containing'] in column for column in columns):
+            continue
+        return format_setting
+    raise UnknownPlatformError(f"{os.path.basename(file_path)}: Could not tell which platform the file was exported from.")
+
+# Function to read and process one export. Runs in a worker process. Without a format setting, the format
+# is worked out from the file's columns.
+def process_export(file_path, format_setting, options, cache_dir=None):
+    format_setting = format_setting or detect_ctrlr_format(file_path)
+    cache = InputCache(cache_dir) if cache_dir else None
+    try:
+        df = process_file(file_path, format_setting, options, cache)
+    except ProcessingError as e:
+        raise ProcessingError(f"{os.path.basename(file_path)}: {e}") from e
+    return df[CTRLR_COLUMNS]
+
+# Function to keep one row per 'Student Course Name'. The best row is the one that is complete, then has
+# the highest score, then the most certificates, then the latest completion date. Rows keep the order the
+# files and rows were given in.
+def best_rows(df):
+    score = pd.to_numeric(df['Exam Score'], errors='coerce')
+    text_score = df['Exam Score'].astype(str).str.strip().str.upper().map(TEXT_SCORES)
+    ranks = pd.DataFrame({
+        'complete': (df['Status'] == 'Complete').to_numpy(),
+        'score': score.fillna(text_score).fillna(-np.inf).to_numpy(),
+        'certificates': pd.to_numeric(df['Certificates Earned'], errors='coerce').fillna(-1).to_numpy(),
+        'completed': pd.to_datetime(df['Course Completion Date'], errors='coerce').fillna(pd.Timestamp.min).to_numpy(),
+    })
+    # A stable sort keeps equal rows in their original order, so the last of equally good rows is kept.
+    order = ranks.sort_values(list(ranks.columns), kind='stable').index
+    best = df.iloc[order].drop_duplicates(subset=[KEY_COLUMN], keep='last')
+    return best.sort_index()
+
+# Function to merge CTRL-R exports into one import file. format_setting applies to every file; without it
+# each file's format is worked out from its columns. With an ImportState, only the rows that are new or
+# changed since the last merged import are written. Returns the number of rows written, the ImportChanges
+# of an incremental merge, or None, and the messages of the files that were skipped because their platform
+# could not be worked out.
+def merge_files(input_paths, output_path, options, format_setting=None, cache=None, state=None, progress=None,
+                log_path=None, dump_dir=None, workers=None):
+    with profile_run(input_paths, MERGED_CTRLR_IMPORT, log_path, dump_dir) as profiler:
+        progress = profiler.wrap(progress)
+        cache_dir = cache.directory if cache is not None else None
+
+        # 1: Read and process the files at the same time, keeping the results in the order of the files.
+        report_progress(progress, "read")
+        results = [None] * len(input_paths)
+        skipped = {}
+        if len(input_paths) == 1 or workers == 1:
+            for position, path in enumerate(input_paths):
+                try:
+                    results[position] = process_export(path, format_setting, options, cache_dir)
+                except UnknownPlatformError as e:
+                    skipped[position] = str(e)
+                report_progress(progress, "read", (position + 1) / len(input_paths))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = {executor.submit(process_export, path, format_setting, options, cache_dir): position
+                           for position, path in enumerate(input_paths)}
+                try:
+                    for done, future in enumerate(as_completed(futures), 1):
+                        try:
+                            results[futures[future]] = future.result()
+                        except UnknownPlatformError as e:
+                            skipped[futures[future]] = str(e)
+                        report_progress(progress, "read", done / len(input_paths))
+                except BaseException:
+                    executor.shutdown(cancel_futures=True)
+                    raise
+        skipped = [skipped[position] for position in sorted(skipped)]
+        results = [result for result in results if result is not None]
+        if not results:
+            raise ProcessingError("None of the files could be merged.\n" + "\n".join(skipped))
+
+        # 2: Combine the results and keep the best row of each student and course.
+        df = pd.concat(results, ignore_index=True)
+        report_progress(progress, "transform", shape=df.shape)
+        df = best_rows(df).reset_index(drop=True)
+        changes = None
+        if state is not None:
+            changes = state.diff(df, MERGED_CTRLR_IMPORT)
+            df = changes.rows
+
+        # 3: Write the merged import.
+        save_file(df, output_path, MERGED_CTRLR_IMPORT, options, progress)
+        if changes is not None:
+            state.commit(changes)
+    return len(df), changes, skipped
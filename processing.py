@@ -0,0 +1,441 @@
+# Headless processing functions used by both the GUI (main.py) and the batch command line (batch.py).
+# Nothing in this module touches tkinter, so it can be imported on a server without a display and
+# from worker processes. The processed data is written out by writer.py. The numbered comments
+# continue the walkthrough that starts in main.py.
+
+import csv
+import io
+import itertools
+import warnings
+
+import numpy as np
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+from profiles import PROFILES
+from readers import column_selector, read_excel_columns
+from settings import CTRLR_FORMATS, FORMAT_SETTINGS
+
+# Number of rows parsed at a time when reading a CSV file.
+CSV_CHUNK_ROWS = 10000
+
+# The options a user can change in the GUI. The defaults match the initial values of the GUI controls.
+DEFAULT_OPTIONS = {
+    'sort_order': "Descending",
+    'word_wrap': 1,
+    'center_text': 1,
+    'autosize_columns': 1,
+    'resize_columns': 0,
+    'column_width': 18,
+    'passing_percentage': 70,
+    'northstar_passing_certificates': 5,
+}
+
+# Raised when an input file cannot be processed. The GUI shows the message in an error dialog and the
+# batch command line prints it.
+class ProcessingError(Exception):
+    pass
+
+# Raised by a progress callback to stop processing a file, for example when the GUI's Cancel button is pressed.
+class ProcessingCancelled(Exception):
+    pass
+
+# Function to fill in any options that were not given with their defaults.
+def resolve_options(options=None):
+    resolved = dict(DEFAULT_OPTIONS)
+    if options:
+        resolved.update(options)
+    return resolved
+
+# Function to read and process a file based on the selected format setting. Returns the processed DataFrame.
+# If an InputCache is given (see cache.py), a file that has been read before is loaded from the cache.
+def process_file(file_path, format_setting, options=None, cache=None, progress=None):
+    options = resolve_options(options)
+    if format_setting not in PROFILES:
+        raise ProcessingError(f"Unknown format setting: {format_setting}")
+
+    # 14: Read the input file into a pandas DataFrame.
+    report_progress(progress, "read")
+    try:
+        if cache is not None:
+            df = cache.load(file_path, format_setting, lambda: read_input(file_path, format_setting, progress))
+        else:
+            df = read_input(file_path, format_setting, progress)
+    except ProcessingCancelled:
+        raise
+    except Exception as e:
+        raise ProcessingError(f"Failed to process the file\n{e}") from e
+
+    # 15: Run the processing of the format setting's profile (see profiles.py).
+    report_progress(progress, "transform", shape=df.shape)
+    profile = PROFILES[format_setting]
+    if profile.transform == "gmetrix report":
+        df = process_gmetrix(df, options, GmetrixReportIndex(df))
+    elif profile.transform == "ctrlr":
+        df = COMPILED_PROFILES[format_setting].run(df, options)
+    return df
+
+# Function to call a progress callback, if there is one. shape is the (rows, columns) of the data the stage
+# works on, when it is known.
+def report_progress(progress, stage, fraction=0.0, shape=None):
+    if progress is not None:
+        progress(stage, fraction, shape)
+
+# Function to read an input file into a DataFrame the way the format setting needs it.
+def read_input(file_path, format_setting, progress=None):
+    if format_setting in CTRLR_FORMATS:
+        compiled = COMPILED_PROFILES[format_setting]
+        # Only the columns the profile needs are read, from a CSV export as well as an Excel one.
+        if file_path.lower().endswith('.csv'):
+            return pd.read_csv(file_path, usecols=column_selector(compiled.usecols), dtype=compiled.dtype,
+                               encoding='utf-8-sig')
+        return read_excel_columns(file_path, compiled.usecols, compiled.dtype)
+    elif file_path.endswith('.csv'):
+        return read_ragged_csv(file_path, progress=progress)
+    else:
+        return pd.read_excel(file_path, header=None)
+
+# 16: Define the processing of the format settings.
+
+# Index of the text in a Gmetrix student progress report. It is built once when the report is loaded, and
+# maps the markers in the report (section headers, course titles, 'Test Score' and other column headings)
+# to their (row, column) positions, so the processing steps do not have to scan every cell of every
+# column to find them. The text of every non-empty cell is converted and normalized (stripped and
+# lowercased) in one vectorized pass.
+class GmetrixReportIndex:
+    def __init__(self, df):
+        cells = df.stack()
+        self.text = cells.astype(str)
+        self.normalized = self.text.str.strip().str.lower()
+        self.columns = list(df.columns)
+        self.found = {}
+
+    # Function to find the (row, column) positions of the cells whose normalized text is the marker. Each
+    # marker is looked up once and remembered.
+    def positions(self, marker):
+        marker = marker.strip().lower()
+        if marker not in self.found:
+            self.found[marker] = self.normalized.index[self.normalized == marker].tolist()
+        return self.found[marker]
+
+    # Function to find the rows in a column whose normalized text is the marker.
+    def rows(self, marker, col):
+        return [row for row, column in self.positions(marker) if column == col]
+
+    # Function to find the columns holding a cell whose normalized text is one of the markers.
+    def columns_with(self, *markers):
+        found = set(self.normalized.index[self.normalized.isin([m.strip().lower() for m in markers])].get_level_values(1))
+        return [col for col in self.columns if col in found]
+
+    # Function to find the columns holding a cell that contains the text, matching case.
+    def columns_containing(self, text):
+        found = set(self.text.index[self.text.str.contains(text, regex=False)].get_level_values(1))
+        return [col for col in self.columns if col in found]
+
+    # Function to find the section headers, such as "Domain 1: Technology Basics". These are rows with a
+    # single cell of text, in the first column. Returns a dict of header text to the list of (row, column)
+    # positions it is found at, like positions, since a header can appear more than once.
+    def section_headers(self):
+        row_labels = self.text.index.get_level_values(0)
+        single = self.text[~row_labels.duplicated(keep=False)]
+        single = single[single.index.get_level_values(1) == self.columns[0]]
+        headers = {}
+        for position, text in single.items():
+            headers.setdefault(text, []).append(position)
+        return headers
+
+    # Function to find the course titles, which are in the row directly above each 'Test Score' heading.
+    # Returns a dict of course title to the list of (row, column) positions it is found at.
+    def course_titles(self):
+        titles = {}
+        for row, col in self.positions('Test Score'):
+            if (row - 1, col) in self.text.index:
+                titles.setdefault(self.text[(row - 1, col)], []).append((row - 1, col))
+        return titles
+
+# Function to process Gmetrix Raw Data.
+def process_gmetrix(df, options, index=None):
+    if index is None:
+        index = GmetrixReportIndex(df)
+
+    # 17: Remove columns containing "Minutes Spent" or "Score".
+    columns_to_remove = index.columns_with("minutes spent", "score")
+    df.drop(columns_to_remove, axis=1, inplace=True)
+
+    # 18: Sort data if required.
+    sort_order = options['sort_order']
+    if sort_order != "Unsorted":
+        post_assessment_cols = [col for col in index.columns_containing("Post-Assessment") if col not in columns_to_remove]
+        df = sort_score_blocks(df, post_assessment_cols, sort_order == "Ascending", index)
+    return df
+
+# Function to find the blocks of scores in a column. A block is the run of non-empty cells directly below
+# a 'Test Score' cell (marker_rows), ending at the next empty cell. Returns the start and end row positions
+# of every block.
+def find_score_blocks(values, marker_rows):
+    blank_rows = np.flatnonzero(pd.isna(values))
+    starts = np.sort(marker_rows) + 1
+    next_blank = np.searchsorted(blank_rows, starts)
+    # A block with no empty cell after it, at the bottom of the report, has always been left unsorted.
+    # It is given no rows so the output stays the same as it has been.
+    ends = starts.copy()
+    has_blank = next_blank < len(blank_rows)
+    ends[has_blank] = blank_rows[next_blank[has_blank]]
+    return starts, ends
+
+# Function to sort positions the same way DataFrame.sort_values does (quicksort, missing values last), so
+# students with equal scores keep the order they have always been given.
+def sorted_positions(scores, ascending):
+    positions = np.arange(len(scores))
+    missing = pd.isna(scores)
+    valid_scores = scores[~missing]
+    valid_positions = positions[~missing]
+    if not ascending:
+        valid_scores = valid_scores[::-1]
+        valid_positions = valid_positions[::-1]
+    order = valid_positions[valid_scores.argsort(kind='quicksort')]
+    if not ascending:
+        order = order[::-1]
+    return np.concatenate([order, positions[missing]])
+
+# Function to sort the rows of every score block in the given columns by score. The scores of each column
+# are parsed once for the whole column, and each block only reorders a permutation of the row positions,
+# so the rows of the DataFrame are moved once at the end instead of once per block.
+def sort_score_blocks(df, score_cols, ascending, index):
+    order = np.arange(len(df))
+    position_of = np.arange(len(df))
+
+    for col in score_cols:
+        text = df[col].astype(str).str.rstrip('%')
+        scores = pd.to_numeric(text, errors='coerce').to_numpy(dtype=float)
+        # A block of whole numbers is sorted and written back as whole numbers ("75%"), any other block
+        # as decimals ("75.0%"), the same as converting each block on its own.
+        whole_numbers = text.str.fullmatch(r'[+-]?\d+').to_numpy(dtype=bool)
+        values = df[col].to_numpy(dtype=object, copy=True)
+
+        # Earlier columns may already have moved rows, so the blocks are found in the current row order.
+        marker_rows = position_of[index.rows('Test Score', col)]
+        starts, ends = find_score_blocks(values[order], marker_rows)
+        for start, end in zip(starts, ends):
+            rows = order[start:end].copy()
+            if len(rows) == 0:
+                continue
+            block_scores = scores[rows]
+            if whole_numbers[rows].all():
+                block_scores = block_scores.astype(np.int64)
+            block_order = sorted_positions(block_scores, ascending)
+            order[start:end] = rows[block_order]
+            position_of[order[start:end]] = np.arange(start, end)
+            for row, score in zip(rows, block_scores):
+                if not pd.isna(score):
+                    values[row] = f"{score}%"
+        df[col] = values
+
+    return df.take(order).reset_index(drop=True)
+
+# A CTRL-R profile compiled into the steps that make an import from an export. Everything that can be
+# worked out from the profile alone, such as the columns to read and their types, is worked out once when
+# the program starts, and every step works on whole columns at once.
+class CompiledProfile:
+    def __init__(self, profile):
+        self.profile = profile
+        self.required_columns = profile.required_columns
+        # Work out the columns to read from an Excel file and the ones to read as text.
+        if profile.count_columns is None:
+            self.usecols = list(profile.required_columns)
+        else:
+            required = set(profile.required_columns)
+            self.usecols = lambda name: name in required or profile.count_columns in str(name)
+        self.dtype = {column: str for column in profile.text_columns}
+        course = profile.course
+        self.course_column = course.get("column")
+        self.course_value = course.get("value")
+        self.keep_rows = list(profile.keep_rows.items())
+        self.exam_score = profile.exam_score
+        rule = profile.rule
+        self.pass_measure = rule.get("measure")
+        self.threshold = rule.get("at_least")
+        self.pass_column = rule.get("column")
+        self.pass_text = rule["equals"].upper() if "equals" in rule else None
+        self.measures = {self.pass_measure, profile.exam_score if isinstance(profile.exam_score, str) else None,
+                         profile.certificates} - {None}
+
+    # Function to make the CTRL-R import from an input DataFrame. The steps are separate methods so the
+    # benchmarks can time each of them (see benchmarks/bench_transforms.py).
+    def run(self, df, options):
+        df = self.select_rows(df)
+        measures = self.measure(df)
+        outcome = self.outcome(df, measures, options)
+        return self.build_output(df, outcome)
+
+    # 19: Check the columns, drop the rows with missing values and keep only the rows the profile wants.
+    def select_rows(self, df):
+        missing = [col for col in self.required_columns if col not in df.columns]
+        if missing:
+            raise ProcessingError(f"Input file does not contain the required columns: {', '.join(missing)}.")
+        if self.profile.drop_missing:
+            df = df.dropna(subset=self.profile.drop_missing)
+        for column, values in self.keep_rows:
+            df = df[df[column].isin(values)]
+        return df
+
+    # 20: Work out the measures the profile uses: the score, or the count of the columns whose names contain
+    # count_columns (such as NorthStar's 'Certificate Earned' columns).
+    def measure(self, df):
+        profile = self.profile
+        measures = {}
+        if 'score' in self.measures:
+            codes, scores = pd.factorize(df[profile.score_column], use_na_sentinel=False)
+            measures['score'] = pd.Series(pd.Index(scores).astype(str).str.rstrip('%').astype(float).take(codes), index=df.index)
+        if 'count' in self.measures:
+            count_columns = [col for col in df.columns if profile.count_columns in str(col)]
+            if not count_columns:
+                raise ProcessingError(f"No '{profile.count_columns}' columns found in the input file.")
+            measures['count'] = sum(pd.to_numeric(df[col], errors='coerce').fillna(0) for col in count_columns)
+        return measures
+
+    # Function to work out whether each row passed and the columns that follow from it. Returns a dict of
+    # the status, exam score, certificates and completion date columns.
+    def outcome(self, df, measures, options):
+        profile = self.profile
+        # 21: Work out whether each row passed. The threshold is one of the options or a number.
+        if self.pass_measure is not None:
+            threshold = options[self.threshold] if isinstance(self.threshold, str) else self.threshold
+            passed = (measures[self.pass_measure] >= threshold).to_numpy()
+        else:
+            passed = (df[self.pass_column].str.upper() == self.pass_text).to_numpy()
+
+        # 22: Fill in the exam score, certificates and completion date the profile asks for.
+        if isinstance(self.exam_score, str):
+            exam_score = measures[self.exam_score]
+        else:
+            exam_score = choose(passed, *self.exam_score)
+        return {
+            'status': choose(passed, 'Complete', 'In Progress'),
+            'exam_score': exam_score,
+            'certificates': measures['count'].astype(int) if profile.certificates == 'count' else '',
+            'completion_date': df[profile.completion_date] if profile.completion_date else '',
+        }
+
+    # Function to build the CTRL-R columns of the import from the rows and their outcome.
+    def build_output(self, df, outcome):
+        profile = self.profile
+        # 23: Combine the first and last names to create 'Students', and find the course of each row.
+        students = student_names(df[profile.first_name], df[profile.last_name])
+        if self.course_column is not None:
+            course_name = df[self.course_column]
+            key_course_name = stripped_text(course_name)
+        else:
+            course_name = self.course_value
+            key_course_name = (np.zeros(len(df), dtype=np.intp), np.array([self.course_value], dtype=object))
+
+        # 24: Build the output columns in the CTRL-R order.
+        return ctrlr_output(df.index, students, course_name, key_course_name, **outcome)
+
+# The text columns of the CTRL-R exports repeat the same few students and courses on many rows, so they
+# are handled as (codes, distinct values) pairs from pd.factorize. Each distinct value is stripped, and
+# each distinct combination joined, once, and the results are spread back to the rows at the end.
+
+# Function to strip the text of a column. Returns the codes of the rows and the distinct stripped values.
+def stripped_text(column):
+    codes, uniques = pd.factorize(column, use_na_sentinel=False)
+    return codes, pd.Index(uniques).astype(str).str.strip().to_numpy(dtype=object)
+
+# Function to join two factorized text columns with a separator, one distinct pair at a time.
+def join_text(left, right, separator):
+    left_codes, left_text = left
+    right_codes, right_text = right
+    width = max(len(right_text), 1)
+    codes, pairs = pd.factorize(left_codes.astype(np.int64) * width + right_codes)
+    return codes, left_text[pairs // width] + separator + right_text[pairs % width]
+
+# Function to join the first and last name columns into the students' names.
+def student_names(first_names, last_names):
+    return join_text(stripped_text(first_names), stripped_text(last_names), ' ')
+
+# Function to pick one of two values for every row from a boolean array.
+def choose(condition, if_true, if_false):
+    return np.array([if_false, if_true], dtype=object).take(condition.astype(np.intp))
+
+# Function to build a CTRL-R import DataFrame from its columns. Single values are repeated for every row.
+# The 'Student Course Name' key is made from the students and the factorized course names.
+def ctrlr_output(index, students, course_name, key_course_name, status, exam_score, certificates, completion_date):
+    student_codes, student_text = students
+    key_codes, key_text = join_text(students, key_course_name, ' - ')
+    return pd.DataFrame({
+        'Students': student_text[student_codes],
+        'Course Name': course_name,
+        'Status': status,
+        'Exam Score': exam_score,
+        'Certificates Earned': certificates,
+        'Course Completion Date': completion_date,
+        'Student Course Name': key_text[key_codes],
+    }, index=index)
+
+# Function to read a CSV file whose rows have different numbers of fields, such as the Gmetrix student
+# progress report. The file is read into memory once, the width of its widest row is found from the bytes,
+# and pd.read_csv parses it with that many columns, so short rows are padded with missing values without
+# the file being rewritten.
+def read_ragged_csv(file_path, progress=None):
+    with open(file_path, 'rb') as file:
+        data = file.read()
+    width = csv_width(data)
+    try:
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always', pd.errors.DtypeWarning)
+            df = pd.read_csv(io.BytesIO(data), header=None, names=range(width), encoding='utf-8-sig',
+                             skip_blank_lines=False)
+    except pd.errors.EmptyDataError:
+        raise ProcessingError("The CSV file is empty.") from None
+
+    # pd.read_csv works out the column types a block of rows at a time, and warns when a column holds
+    # numbers in one block and text in another. Such a column is text in the whole file, so only those
+    # columns are parsed again, from the data already in memory, keeping their text.
+    if any(issubclass(warning.category, pd.errors.DtypeWarning) for warning in caught):
+        mixed = [col for col in df.columns if df[col].dtype == object
+                 and pd.api.types.infer_dtype(df[col], skipna=True) != 'string']
+        if mixed:
+            df[mixed] = pd.read_csv(io.BytesIO(data), header=None, names=range(width), usecols=mixed, dtype=object,
+                                    encoding='utf-8-sig', skip_blank_lines=False)
+    report_progress(progress, "sanitize", shape=df.shape)
+    return df
+
+# Function to find the number of fields in the widest row of CSV data from the number of commas on each
+# line. A line with quotes can have commas inside a value, so those lines are parsed with the csv module,
+# and if a quoted value runs over several lines, the whole file is.
+def csv_width(data):
+    lines = data.split(b'\n')
+    commas = np.fromiter(map(bytes.count, lines, itertools.repeat(b',')), dtype=np.int64, count=len(lines))
+    # Quotes are rare, so they are found by position and counted per line.
+    text = np.frombuffer(data, dtype=np.uint8)
+    line_numbers = np.searchsorted(np.flatnonzero(text == ord('\n')), np.flatnonzero(text == ord('"')))
+    quotes = np.bincount(line_numbers, minlength=len(lines))
+    if (quotes % 2).any():
+        return max(map(len, csv.reader(io.StringIO(data.decode('utf-8-sig'), newline=''))), default=0)
+    plain = quotes == 0
+    width = int(commas[plain].max()) + 1 if plain.any() else 0
+    quoted = [lines[number].decode('utf-8-sig') for number in np.flatnonzero(~plain)]
+    return max(width, max(map(len, csv.reader(quoted)), default=0))
+
+# Function to parse rows of text into a DataFrame with numbered columns, the way pd.read_csv parses them.
+# Short rows are padded with missing values. dtype gives the type of all or some of the columns, such as
+# object to keep their text.
+def parse_rows(rows, dtype=None):
+    width = max(1, max(map(len, rows)))
+    padded = [row + [''] * (width - len(row)) if len(row) < width else row for row in rows]
+    if isinstance(dtype, dict):
+        dtype = {col: column_type for col, column_type in dtype.items() if col < width}
+    return TextParser(padded, header=None, names=range(width), dtype=dtype, skip_blank_lines=False).read()
+
+# Function to stream the rows of a CSV file as lists of text, chunk_rows rows at a time.
+def csv_row_chunks(file_path, chunk_rows=CSV_CHUNK_ROWS):
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as file:
+        reader = csv.reader(file)
+        while True:
+            rows = list(itertools.islice(reader, chunk_rows))
+            if not rows:
+                break
+            yield rows
+
+# The CTRL-R profiles, compiled once when the module is loaded.
+COMPILED_PROFILES = {name: CompiledProfile(PROFILES[name]) for name in CTRLR_FORMATS}
@@ -0,0 +1,240 @@
+# Timing log for saved files. Every save records how long each stage took (see STAGES in settings.py),
+# the memory used during the stage and the number of rows and columns the stage worked on, and appends the
+# run as one line of JSON to a log file. The log of many runs, from many machines, can be combined to see
+# where the time goes. For example:
+#   {"time": "2024-09-20T10:15:02", "host": "FRONTDESK-2", "input": "export.csv", "input_bytes": 482113,
+#    "format_setting": "Gmetrix Raw Data", "status": "ok", "seconds": 1.42,
+#    "stages": [{"stage": "read", "seconds": 0.31, "rows": null, "columns": null, "rss_start_mb": 98.2,
+#                "rss_end_mb": 117.9, "peak_rss_mb": 121.4, "process_peak_mb": 121.4}, ...]}
+# The memory of each stage is the resident memory of the process at its start and end, and its peak while
+# the stage ran, which is sampled in a background thread. process_peak_mb is the most memory the process
+# has used since it started, up to the end of the stage.
+#
+# With a dump directory, the run is also profiled with cProfile and tracemalloc. The profile is saved as
+# <input>-<time>.prof (open it with python -m pstats or snakeviz), the largest allocations at the end of the
+# stage that used the most memory are written to <input>-<time>-memory.txt, and each stage in the log also
+# gets the peak memory traced during the stage.
+# Profiling slows the run down, so it is only done when asked for.
+
+import cProfile
+import json
+import logging
+import os
+import platform
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+from cache import default_data_dir
+from processing import ProcessingCancelled
+
+logger = logging.getLogger(__name__)
+
+LOG_FILE_NAME = 'timings.jsonl'
+# Environment variable that turns on profiling in the GUI, set to the directory to write the profiles to.
+DUMP_DIR_VARIABLE = 'PROFILE_DUMP_DIR'
+TOP_ALLOCATIONS = 25
+# Seconds between the samples of the memory used during a stage.
+SAMPLE_INTERVAL = 0.01
+
+# Function to find the default location of the timing log.
+def default_log_path():
+    return os.path.join(default_data_dir(), LOG_FILE_NAME)
+
+# Function to read the memory counters of the process on Windows.
+def windows_memory_counters():
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters
+
+# Function to return the memory the process uses now (its resident set), in megabytes, or None where it
+# cannot be read without extra packages (macOS).
+def rss_mb():
+    if sys.platform == 'win32':
+        counters = windows_memory_counters()
+        return counters.WorkingSetSize / 2 ** 20 if counters is not None else None
+    try:
+        with open('/proc/self/statm', 'r') as file:
+            resident_pages = int(file.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+
+# Function to return the most memory the process has used since it started, in megabytes.
+def process_peak_mb():
+    if sys.platform == 'win32':
+        counters = windows_memory_counters()
+        return counters.PeakWorkingSetSize / 2 ** 20 if counters is not None else None
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS reports bytes.
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+# Function to round a number of megabytes for the log, keeping None.
+def round_mb(value):
+    return round(value, 1) if value is not None else None
+
+# Samples the memory of the process in a background thread while a stage runs, to find the peak of the
+# stage. Peaks shorter than SAMPLE_INTERVAL can be missed.
+class MemorySampler(threading.Thread):
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.start_mb = rss_mb()
+        self.peak = self.start_mb
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.peak = max(self.peak, rss_mb() or 0)
+
+    # Function to stop sampling and return the peak seen, or None if the memory cannot be read.
+    def stop(self):
+        self.stopped.set()
+        self.join()
+        return self.peak
+
+# Records the stages of one run. It is used as a progress callback, so it sees each stage start, and can
+# pass the progress on to another callback.
+class StageProfiler:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.stage = None
+        self.started = None
+        # The tracemalloc snapshot taken at the end of the stage with the highest traced peak.
+        self.snapshot = None
+        self.largest_peak = 0
+        self.sampler = None
+        self.process_peak_at_start = None
+
+    # Function to wrap a progress callback so that the stages are recorded before it is called.
+    def wrap(self, progress=None):
+        def report(stage, fraction, shape=None):
+            self(stage, fraction, shape)
+            if progress is not None:
+                progress(stage, fraction, shape)
+        return report
+
+    def __call__(self, stage, fraction, shape=None):
+        if stage != self.stage:
+            self.finish_stage()
+            self.stage = stage
+            self.started = time.perf_counter()
+            rows, columns = shape if shape is not None else (None, None)
+            self.stages.append({"stage": stage, "seconds": None, "rows": rows, "columns": columns})
+            self.process_peak_at_start = process_peak_mb()
+            self.sampler = MemorySampler()
+            if self.sampler.start_mb is not None:
+                self.sampler.start()
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+
+    # Function to record the end of the running stage.
+    def finish_stage(self):
+        if self.stage is None:
+            return
+        record = self.stages[-1]
+        record["seconds"] = round(time.perf_counter() - self.started, 4)
+        peak = self.sampler.stop() if self.sampler.is_alive() else None
+        end = rss_mb()
+        process_peak = process_peak_mb()
+        # When the process reached a new peak during the stage, that peak is the stage's, and exact.
+        if process_peak is not None and self.process_peak_at_start is not None and process_peak > self.process_peak_at_start:
+            peak = process_peak
+        if peak is not None and end is not None:
+            peak = max(peak, end)
+        record["rss_start_mb"] = round_mb(self.sampler.start_mb)
+        record["rss_end_mb"] = round_mb(end)
+        record["peak_rss_mb"] = round_mb(peak)
+        record["process_peak_mb"] = round_mb(process_peak)
+        if self.trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1]
+            record["traced_peak_mb"] = round(traced_peak / 2 ** 20, 1)
+            if traced_peak > self.largest_peak:
+                self.largest_peak = traced_peak
+                self.snapshot = tracemalloc.take_snapshot()
+        self.stage = None
+
+# Function to profile one run of processing and saving a file, or a list of files that are merged. Yields
+# the StageProfiler to use as the progress callback, and appends the run to the log file when it ends,
+# however it ends. With a dump directory, the run is also profiled with cProfile and tracemalloc.
+@contextmanager
+def profile_run(input_path, format_setting, log_path=None, dump_dir=None):
+    input_paths = list(input_path) if isinstance(input_path, (list, tuple)) else [input_path]
+    profiler = StageProfiler(trace_memory=dump_dir is not None)
+    profile = None
+    if dump_dir is not None:
+        tracemalloc.start()
+        profile = cProfile.Profile()
+        profile.enable()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield profiler
+    except ProcessingCancelled:
+        status = "cancelled"
+        raise
+    except Exception:
+        status = "failed"
+        raise
+    finally:
+        profiler.finish_stage()
+        seconds = time.perf_counter() - start
+        if profile is not None:
+            profile.disable()
+            write_dumps(profile, profiler.snapshot, input_paths[0], dump_dir)
+            tracemalloc.stop()
+        if log_path is not None:
+            append_run(log_path, {
+                "time": datetime.now().isoformat(timespec='seconds'),
+                "host": platform.node(),
+                "input": ", ".join(os.path.basename(path) for path in input_paths),
+                "input_bytes": sum(os.path.getsize(path) for path in input_paths if os.path.exists(path)),
+                "format_setting": format_setting,
+                "status": status,
+                "seconds": round(seconds, 4),
+                "stages": profiler.stages,
+            })
+
+# Function to save the cProfile statistics of a profiled run, and the largest allocations held at the end
+# of the stage that used the most memory.
+def write_dumps(profile, snapshot, input_path, dump_dir):
+    os.makedirs(dump_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    prefix = os.path.join(dump_dir, f"{stem}-{datetime.now():%Y%m%d-%H%M%S}")
+    profile.dump_stats(prefix + ".prof")
+    if snapshot is not None:
+        with open(prefix + "-memory.txt", 'w', encoding='utf-8') as file:
+            for statistic in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]:
+                file.write(f"{statistic}\n")
+    logger.info("Profile of %s written to %s.prof", os.path.basename(input_path), prefix)
+
+# Function to append a run to the log file as one line of JSON. The log is only for diagnosis, so a
+# failure to write it is logged rather than raised.
+def append_run(log_path, record):
+    try:
+        directory = os.path.dirname(log_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(record) + "\n")
+    except OSError as e:
+        logger.warning("Could not write the timing log %s: %s", log_path, e)
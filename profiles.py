@@ -0,0 +1,254 @@
+# Registry of the format settings. Each format is described by a profile: the input files it takes, the
+# columns it needs, how a CTRL-R import is made from them and the text shown in the GUI. The GUI, batch
+# mode, the merge and the processing (see processing.py) all work from these profiles, so a new learning
+# platform only needs a new profile. Profiles can be added without changing the code by putting them in a
+# JSON file (see load_profiles). This module only uses the standard library, so the GUI can build its
+# window from it without waiting for pandas to load.
+#
+# A profile is a dict with these keys:
+#   name             - the format setting shown in the dropdown and given to --format.
+#   description      - the instructions shown in the GUI when the format is selected.
+#   input            - the input files it takes: "csv" or "any" (CSV or Excel).
+#   transform        - how the data is processed: "ctrlr" makes a CTRL-R import from the rules below,
+#                      "gmetrix report" cleans up a Gmetrix student progress report, "none" keeps the data.
+# CTRL-R profiles also have:
+#   required_columns - the columns the input must have. Only these are read from an Excel file.
+#   text_columns     - the required columns read as text.
+#   first_name, last_name - the columns joined into the 'Students' names.
+#   course           - {"column": name} to take the course from a column, or {"value": text} for one course.
+#   pass             - when a row is 'Complete': {"measure": "score" or "count", "at_least": option or number}
+#                      or {"column": name, "equals": text}, compared without case.
+#   exam_score       - "score", "count", or [text if passed, text if not].
+# and optionally:
+#   score_column     - the column of percentage scores the "score" measure reads.
+#   count_columns    - text in the names of the columns the "count" measure adds up (for example
+#                      certificates earned). Those columns are read as well as the required ones.
+#   drop_missing     - columns where a missing value drops the row.
+#   keep_rows        - {column: [values]} to only keep the rows with one of the values.
+#   certificates     - "count" to fill 'Certificates Earned' with the count measure.
+#   completion_date  - the column to fill 'Course Completion Date' from.
+#   detect           - {"columns": [names], "columns_containing": text} to recognize an export of the
+#                      platform by its columns when exports are merged.
+
+import json
+import os
+import sys
+
+# The file that extra profiles are read from, in the application's folder. The FORMAT_PROFILES environment
+# variable can give another file.
+PROFILES_FILE = "format_profiles.json"
+INPUT_TYPES = ("csv", "any")
+TRANSFORMS = ("ctrlr", "gmetrix report", "none")
+MEASURES = ("score", "count")
+# The options a pass rule can compare against, and so the GUI controls a CTRL-R profile can show.
+PASS_OPTIONS = ("passing_percentage", "northstar_passing_certificates")
+CTRLR_REQUIRED_KEYS = ("required_columns", "first_name", "last_name", "course", "pass", "exam_score")
+
+BUILTIN_PROFILES = [
+    {
+        "name": "Gmetrix Raw Data",
+        "description": "Gmetrix Raw Data - This setting takes a CSV Gmetrix student progress report as input. It removes the 'Minutes Spent' and 'Score' columns, sizes columns to 18, and centers and wraps all text, and outputs an XLSX file. To sort the rows by post-assessment score, select an option from the Sort Order dropdown. Descending places the highest scores at the top of the sheet.",
+        "input": "csv",
+        "transform": "gmetrix report",
+    },
+    {
+        "name": "Gmetrix for CTRL-R Import",
+        "description": "Gmetrix for CTRL-R Import - This setting takes a CSV Gmetrix student progress report as input. It removes and combines columns to create a file compatible with the import feature on the CTRL-R All Student Grades report.",
+        "input": "any",
+        "transform": "ctrlr",
+        "required_columns": ["Course Name", "First Name", "Last Name", "Score"],
+        "text_columns": ["Course Name", "First Name", "Last Name"],
+        "drop_missing": ["Course Name", "First Name", "Last Name"],
+        "first_name": "First Name",
+        "last_name": "Last Name",
+        "course": {"column": "Course Name"},
+        "score_column": "Score",
+        "pass": {"measure": "score", "at_least": "passing_percentage"},
+        "exam_score": "score",
+        "detect": {"columns": ["Course Name", "Score"]},
+    },
+    {
+        "name": "NFR Rise Up for CTRL-R Import",
+        "description": "NFR Rise Up for CTRL-R Import - This setting takes an Excel file exported from the NFR Rise Up platform and formats it for CTRL-R import. It processes Exam and Exam Retest entries, combines columns, and creates a compatible file.",
+        "input": "any",
+        "transform": "ctrlr",
+        "required_columns": ["FIRST NAME", "LAST NAME", "COURSE/EXAM", "TYPE", "STATUS", "COMPLETED"],
+        "text_columns": ["FIRST NAME", "LAST NAME", "COURSE/EXAM", "TYPE", "STATUS"],
+        "keep_rows": {"TYPE": ["Exam", "Exam Retest"]},
+        "first_name": "FIRST NAME",
+        "last_name": "LAST NAME",
+        "course": {"column": "COURSE/EXAM"},
+        "pass": {"column": "STATUS", "equals": "Passed"},
+        "exam_score": ["PASS", "FAIL"],
+        "completion_date": "COMPLETED",
+        "detect": {"columns": ["COURSE/EXAM"]},
+    },
+    {
+        "name": "NorthStar for CTRL-R Import",
+        "description": "NorthStar for CTRL-R Import - This setting processes a NorthStar exported Excel file. It counts the total 'Certificate Earned' columns per student, sets the 'Exam Score' to 'Passed' if the student has earned the specified number of certificates, and updates the 'Status' accordingly.",
+        "input": "any",
+        "transform": "ctrlr",
+        "required_columns": ["First Name", "Last Name"],
+        "text_columns": ["First Name", "Last Name"],
+        "count_columns": "Certificate Earned",
+        "first_name": "First Name",
+        "last_name": "Last Name",
+        "course": {"value": "Northstar Digital Literacy"},
+        "pass": {"measure": "count", "at_least": "northstar_passing_certificates"},
+        "exam_score": ["Passed", "Failed"],
+        "certificates": "count",
+        "detect": {"columns_containing": "Certificate Earned"},
+    },
+    {
+        "name": "General Formatting",
+        "description": "General Formatting - This setting takes any CSV or XLSX file and sizes columns to 18 and centers and wraps text.",
+        "input": "any",
+        "transform": "none",
+    },
+]
+
+# Raised when a profile is not valid. The message says which profile and what is wrong with it.
+class ProfileError(Exception):
+    pass
+
+# A validated format profile. The keys of the profile dict are available as attributes, with the
+# optional ones filled in.
+class FormatProfile:
+    def __init__(self, profile):
+        self.name = profile["name"]
+        self.description = profile.get("description", self.name)
+        self.input = profile.get("input", "any")
+        self.transform = profile.get("transform", "none")
+        self.required_columns = list(profile.get("required_columns", []))
+        self.text_columns = list(profile.get("text_columns", []))
+        self.first_name = profile.get("first_name")
+        self.last_name = profile.get("last_name")
+        self.course = profile.get("course")
+        self.score_column = profile.get("score_column")
+        self.count_columns = profile.get("count_columns")
+        self.rule = profile.get("pass")
+        self.exam_score = profile.get("exam_score")
+        self.drop_missing = list(profile.get("drop_missing", []))
+        self.keep_rows = dict(profile.get("keep_rows", {}))
+        self.certificates = profile.get("certificates")
+        self.completion_date = profile.get("completion_date")
+        self.detect = profile.get("detect")
+
+    @property
+    def is_ctrlr(self):
+        return self.transform == "ctrlr"
+
+    # Function to describe the columns the profile reads and their types, so a changed profile does not
+    # reuse an input cached with the old one (see cache.py).
+    def read_key(self):
+        return json.dumps([self.transform, self.required_columns, self.text_columns, self.count_columns])
+
+    # The option the pass rule compares against, which the GUI shows a control for, or None.
+    @property
+    def pass_option(self):
+        if self.is_ctrlr and self.rule.get("at_least") in PASS_OPTIONS:
+            return self.rule["at_least"]
+        return None
+
+# Function to check a profile dict, raising a ProfileError that names the profile if it is not valid.
+def validate_profile(profile):
+    if not isinstance(profile, dict) or not isinstance(profile.get("name"), str) or not profile["name"]:
+        raise ProfileError(f"Every format profile needs a name: {profile!r}")
+    name = profile["name"]
+
+    def check(condition, message):
+        if not condition:
+            raise ProfileError(f"Format profile '{name}': {message}")
+
+    check(profile.get("input", "any") in INPUT_TYPES, f"input must be one of {', '.join(INPUT_TYPES)}.")
+    check(profile.get("transform", "none") in TRANSFORMS, f"transform must be one of {', '.join(TRANSFORMS)}.")
+    if profile.get("transform", "none") != "ctrlr":
+        return
+    missing = [key for key in CTRLR_REQUIRED_KEYS if key not in profile]
+    check(not missing, f"a CTRL-R profile needs {', '.join(missing)}.")
+
+    # Every column a rule reads has to be one of the required columns, so it is read and checked for.
+    required = profile["required_columns"]
+    check(isinstance(required, list) and all(isinstance(column, str) for column in required),
+          "required_columns must be a list of column names.")
+    course, rule, exam_score = profile["course"], profile["pass"], profile["exam_score"]
+    check(isinstance(course, dict) and len(course) == 1 and ("column" in course or "value" in course),
+          "course must be {\"column\": name} or {\"value\": text}.")
+    check(isinstance(rule, dict), "pass must be a rule.")
+    if "measure" in rule:
+        check(rule["measure"] in MEASURES, f"the pass measure must be one of {', '.join(MEASURES)}.")
+        threshold = rule.get("at_least")
+        check(threshold in PASS_OPTIONS or (isinstance(threshold, (int, float)) and not isinstance(threshold, bool)),
+              f"the pass rule needs at_least, a number or one of {', '.join(PASS_OPTIONS)}.")
+    else:
+        check("column" in rule and isinstance(rule.get("equals"), str),
+              "pass must be {\"measure\": ..., \"at_least\": ...} or {\"column\": name, \"equals\": text}.")
+    check(exam_score in MEASURES or (isinstance(exam_score, list) and len(exam_score) == 2),
+          "exam_score must be score, count or [text if passed, text if not].")
+    check(profile.get("certificates") in (None, "count"), "certificates can only be count.")
+
+    measures = {rule.get("measure"), exam_score if isinstance(exam_score, str) else None, profile.get("certificates")}
+    check("score" not in measures or "score_column" in profile, "the score measure needs a score_column.")
+    check("count" not in measures or isinstance(profile.get("count_columns"), str),
+          "the count measure needs count_columns.")
+    for key in ("first_name", "last_name"):
+        check(isinstance(profile[key], str), f"{key} must be a column name.")
+    for key in ("score_column", "completion_date"):
+        check(profile.get(key) is None or isinstance(profile[key], str), f"{key} must be a column name.")
+    check(profile.get("count_columns") is None or isinstance(profile["count_columns"], str),
+          "count_columns must be text in the names of the columns.")
+    for key in ("text_columns", "drop_missing"):
+        columns = profile.get(key, [])
+        check(isinstance(columns, list) and all(isinstance(column, str) for column in columns),
+              f"{key} must be a list of column names.")
+    keep_rows = profile.get("keep_rows", {})
+    check(isinstance(keep_rows, dict) and all(isinstance(values, list) for values in keep_rows.values()),
+          "keep_rows must map columns to lists of values.")
+    referenced = [profile["first_name"], profile["last_name"], course.get("column"), rule.get("column"),
+                  profile.get("score_column"), profile.get("completion_date")]
+    referenced += profile.get("text_columns", []) + profile.get("drop_missing", []) + list(keep_rows)
+    unknown = [column for column in referenced if column is not None and column not in required]
+    check(not unknown, f"{', '.join(map(repr, unknown))} must be in required_columns.")
+    detect = profile.get("detect")
+    check(detect is None or (isinstance(detect, dict) and set(detect) <= {"columns", "columns_containing"} and detect),
+          "detect must have columns and/or columns_containing.")
+
+# Function to find the file that extra profiles are read from.
+def profiles_path():
+    if os.environ.get('FORMAT_PROFILES'):
+        return os.environ['FORMAT_PROFILES']
+    # The PyInstaller build looks next to the executable, otherwise next to the scripts.
+    directory = os.path.dirname(sys.executable if getattr(sys, 'frozen', False) else os.path.abspath(__file__))
+    return os.path.join(directory, PROFILES_FILE)
+
+# Function to load the profiles: the built-in ones, then those in the profiles file, if there is one. The
+# file holds a JSON list of profile dicts. A profile with the name of an existing one replaces it in place. Returns
+# a dict of format setting name to FormatProfile, in dropdown order.
+def load_profiles(path=None):
+    profiles = list(BUILTIN_PROFILES)
+    path = path or profiles_path()
+    if os.path.isfile(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                extra = json.load(file)
+        except (OSError, ValueError) as e:
+            raise ProfileError(f"Could not read the format profiles in {path}\n{e}") from e
+        if not isinstance(extra, list):
+            raise ProfileError(f"{path} must hold a list of format profiles.")
+        profiles += extra
+
+    registry = {}
+    for profile in profiles:
+        validate_profile(profile)
+        registry[profile["name"]] = FormatProfile(profile)
+    return registry
+
+# The profiles, loaded and validated once when the program starts. Every module imports them, so a profiles
+# file that is not valid does not stop the import: the built-in profiles are used instead and the error is
+# kept in PROFILE_ERROR for the GUI and batch mode to report.
+try:
+    PROFILES = load_profiles()
+    PROFILE_ERROR = None
+except ProfileError as e:
+    PROFILES = load_profiles(os.devnull)
+    PROFILE_ERROR = e
@@ -0,0 +1,130 @@
+# Excel reader layer for the CTRL-R import paths. Those formats only need a few columns of a sheet, so
+# instead of loading every column with pd.read_excel, the sheet is streamed row by row and only the
+# wanted columns are converted. The fastest available engine is used:
+#   - python-calamine, a Rust based reader, if it is installed (pip install python-calamine)
+#   - otherwise openpyxl in read-only mode, which is always available
+# Files the engines cannot read (such as old .xls files) fall back to pd.read_excel.
+#
+# The cells are converted the same way pd.read_excel converts them, and the column types are inferred
+# by the same parser, so the DataFrame is the same as pd.read_excel(file_path)[columns].
+
+import openpyxl
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:
+    CalamineWorkbook = None
+
+STREAMED_EXTENSIONS = ('.xlsx', '.xlsm')
+# The values Excel shows for formula errors. The engines return them as text.
+EXCEL_ERRORS = {'#NULL!', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#N/A', '#GETTING_DATA'}
+
+# Function to read the first sheet of an Excel file, keeping only the columns selected by usecols.
+# usecols is a list of column names or a function that takes a column name and returns True to keep it.
+# dtype maps column names to the type to read them as, like pd.read_excel.
+def read_excel_columns(file_path, usecols=None, dtype=None):
+    if not file_path.lower().endswith(STREAMED_EXTENSIONS):
+        return pd.read_excel(file_path, usecols=column_selector(usecols), dtype=dtype)
+    return rows_to_dataframe(sheet_rows(file_path), usecols, dtype)
+
+# Function to read only the column names of the first sheet of an Excel file, named like pd.read_excel names them.
+def read_excel_header(file_path):
+    if not file_path.lower().endswith(STREAMED_EXTENSIONS):
+        return list(pd.read_excel(file_path, nrows=0).columns)
+    rows = sheet_rows(file_path)
+    try:
+        header = next(rows, [])
+    finally:
+        rows.close()
+    return column_names([convert_cell(value) for value in header])
+
+# Function to stream the values of the first sheet of an .xlsx file with the fastest available engine.
+def sheet_rows(file_path):
+    return calamine_rows(file_path) if CalamineWorkbook is not None else openpyxl_rows(file_path)
+
+# Function to turn usecols into a function that returns True for the wanted column names. Missing
+# columns are left out rather than raising an error, so the format's own check can report them.
+def column_selector(usecols):
+    if usecols is None or callable(usecols):
+        return usecols
+    wanted = set(usecols)
+    return lambda name: name in wanted
+
+# Function to stream the values of the first sheet with openpyxl in read-only mode.
+def openpyxl_rows(file_path):
+    wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        # Some exporters write the wrong sheet size, so work it out from the rows like pd.read_excel.
+        ws.reset_dimensions()
+        yield from ws.iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+# Function to read the values of the first sheet with python-calamine.
+def calamine_rows(file_path):
+    sheet = CalamineWorkbook.from_path(file_path).get_sheet_by_index(0)
+    yield from sheet.to_python(skip_empty_area=False)
+
+# Function to convert a cell value the way pd.read_excel does: empty cells become "", error cells become
+# missing and whole floats become integers.
+def convert_cell(value):
+    if value is None:
+        return ""
+    elif isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    elif isinstance(value, str) and value in EXCEL_ERRORS:
+        return float('nan')
+    return value
+
+# Function to build the DataFrame from the streamed rows. The first row holds the column names. Only the
+# wanted columns are converted, and the column types are inferred by the same parser pd.read_excel uses.
+def rows_to_dataframe(rows, usecols, dtype):
+    rows = iter(rows)
+    header = [convert_cell(value) for value in next(rows, [])]
+    names = column_names(header)
+    select = column_selector(usecols)
+    if select is None:
+        wanted = list(range(len(names)))
+    else:
+        wanted = [i for i, name in enumerate(names) if select(name)]
+
+    data = []
+    last_row_with_data = -1
+    for row in rows:
+        values = [convert_cell(row[i]) if i < len(row) else "" for i in wanted]
+        # A row counts as data if any of its cells has a value, not only the wanted ones, so blank rows
+        # are kept or trimmed the same as pd.read_excel.
+        if any(value != "" for value in values) or any(convert_cell(value) != "" for value in row):
+            last_row_with_data = len(data)
+        data.append(values)
+    data = data[:last_row_with_data + 1]
+
+    selected_names = [names[i] for i in wanted]
+    if not data or not selected_names:
+        return pd.DataFrame(index=pd.RangeIndex(len(data)), columns=selected_names)
+    dtype = {name: column_type for name, column_type in (dtype or {}).items() if name in selected_names}
+    parser = TextParser(data, names=selected_names, header=None, dtype=dtype or None, skip_blank_lines=False)
+    return parser.read()
+
+# Function to name the columns from the header row the way pd.read_excel does: blank names become
+# "Unnamed: <position>" and repeated names get ".1", ".2" and so on added.
+def column_names(header):
+    names = []
+    seen = {}
+    for position, name in enumerate(header):
+        if name == "" or name is None:
+            name = f"Unnamed: {position}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+# Function to name the reader that read_excel_columns() uses for .xlsx files, for logs and benchmarks.
+def excel_engine_name():
+    return "python-calamine" if CalamineWorkbook is not None else "openpyxl (read-only)"
@@ -0,0 +1,29 @@
+# Settings shared by the GUI and the processing modules. This module only holds plain values and the
+# format profiles (see profiles.py), so the GUI can build its window from it without waiting for pandas
+# and openpyxl to load.
+
+from profiles import PROFILES
+
+# The format settings offered in the "Format Setting" dropdown, in display order, from the format
+# profiles (see profiles.py).
+FORMAT_SETTINGS = tuple(PROFILES)
+CTRLR_FORMATS = tuple(name for name, profile in PROFILES.items() if profile.is_ctrlr)
+# Several CTRL-R exports, of any of the CTRL-R formats, merged into one import (see merge.py).
+MERGED_CTRLR_IMPORT = "Merged CTRL-R Import"
+# The columns of a CTRL-R import file, in order. 'Student Course Name' is the key CTRL-R matches grades on.
+CTRLR_COLUMNS = ['Students', 'Course Name', 'Status', 'Exam Score',
+                 'Certificates Earned', 'Course Completion Date', 'Student Course Name']
+
+# The file types a file can be saved as. CTRL-R imports are only values under a bold header, so they can
+# also be saved as CSV, or as Parquet for archiving (which needs pyarrow). Everything else is saved as Excel.
+EXCEL_FILE_TYPES = [("Excel files", "*.xlsx")]
+CTRLR_FILE_TYPES = EXCEL_FILE_TYPES + [("CSV files", "*.csv"), ("Parquet files", "*.parquet")]
+TABLE_EXTENSIONS = ('.csv', '.parquet')
+# The file types an input file can be loaded from, for each input type of a format profile.
+INPUT_FILE_TYPES = {"csv": [("CSV files", "*.csv")],
+                    "any": [("Excel files", "*.xlsx;*.xls"), ("CSV files", "*.csv")]}
+
+# The stages a file goes through, in order, as reported to a progress callback. A progress callback is
+# called as progress(stage, fraction, shape) when a stage starts and, for long stages, as it goes along.
+# shape is the (rows, columns) of the data the stage works on, or None if it is not known yet.
+STAGES = ("read", "sanitize", "transform", "format", "write", "save")
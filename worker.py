@@ -0,0 +1,127 @@
+# Background worker for the GUI. Processing and saving a large export can take a while, so the GUI hands
+# each save to a worker thread instead of running it in the button callback, which would freeze the window.
+# Saves queued while one is running are done one after another. The worker reports what it is doing
+# through a message queue that the GUI polls with root.after, and a running save can be cancelled.
+#
+# Messages are tuples that start with the kind of message and the job they are about:
+#   ("progress", job, stage, fraction)   a stage (see STAGES in settings.py) started or moved on
+#   ("done", job, rows, changes)         the file was saved. changes is None unless the save was incremental
+#   ("failed", job, message)             the file could not be processed or saved
+#   ("cancelled", job)                   the job was cancelled before it finished
+
+import queue
+import threading
+
+from chunked import save_chunked, use_chunked
+from incremental import ImportState
+from merge import merge_files
+from profiler import profile_run
+from processing import CTRLR_FORMATS, ProcessingCancelled, ProcessingError, process_file
+from writer import save_file
+
+# A file to process and save, with the settings that were selected when it was queued.
+class SaveJob:
+    def __init__(self, input_path, output_path, format_setting, options, incremental=False):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.format_setting = format_setting
+        self.options = options
+        self.incremental = incremental
+
+    def run(self, cache, state, progress, log_path, dump_dir):
+        return save_formatted_file(self.input_path, self.output_path, self.format_setting, self.options,
+                                   cache, state, progress, log_path, dump_dir)
+
+# Several CTRL-R exports to merge into one import file (see merge.py).
+class MergeJob:
+    def __init__(self, input_paths, output_path, options, incremental=False):
+        self.input_paths = input_paths
+        self.output_path = output_path
+        self.options = options
+        self.incremental = incremental
+        # The messages of the files the merge skipped, filled in when it has run.
+        self.skipped = []
+
+    def run(self, cache, state, progress, log_path, dump_dir):
+        rows, changes, self.skipped = merge_files(self.input_paths, self.output_path, self.options, cache=cache,
+                                                  state=state, progress=progress, log_path=log_path, dump_dir=dump_dir)
+        return rows, changes
+
+# Function to process an input file and save the result. With an ImportState, CTRL-R imports only keep the
+# rows that are new or changed since the last saved import. The time of each stage is appended to the
+# timing log at log_path, and with a dump_dir the run is profiled (see profiler.py). Returns the number of
+# rows written and the ImportChanges of an incremental save, or None.
+def save_formatted_file(input_path, output_path, format_setting, options, cache=None, state=None, progress=None,
+                        log_path=None, dump_dir=None):
+    with profile_run(input_path, format_setting, log_path, dump_dir) as profiler:
+        progress = profiler.wrap(progress)
+        # Large files that are only formatted are streamed a chunk at a time instead, so they fit in
+        # memory (see chunked.py). They are too big to be worth caching.
+        if use_chunked(input_path, format_setting) and output_path.lower().endswith('.xlsx'):
+            return save_chunked(input_path, output_path, options, progress), None
+        df = process_file(input_path, format_setting, options, cache, progress)
+        changes = None
+        if state is not None and format_setting in CTRLR_FORMATS:
+            changes = state.diff(df, format_setting)
+            df = changes.rows
+        save_file(df, output_path, format_setting, options, progress)
+        if changes is not None:
+            state.commit(changes)
+    return len(df), changes
+
+class SaveWorker:
+    def __init__(self, cache=None, state_path=None, log_path=None, dump_dir=None):
+        self.cache = cache
+        self.state_path = state_path
+        self.log_path = log_path
+        self.dump_dir = dump_dir
+        self.jobs = queue.Queue()
+        self.messages = queue.Queue()
+        self.cancel_requested = threading.Event()
+        self.current = None
+        self.thread = threading.Thread(target=self.run, name="SaveWorker", daemon=True)
+        self.thread.start()
+
+    def submit(self, job):
+        self.jobs.put(job)
+
+    # Function to cancel the running job and drop the queued ones.
+    def cancel(self):
+        while True:
+            try:
+                job = self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            self.messages.put(("cancelled", job))
+        if self.current is not None:
+            self.cancel_requested.set()
+
+    def run(self):
+        # SQLite connections can only be used by the thread that opened them, so the worker opens its own.
+        state = None
+        while True:
+            job = self.jobs.get()
+            self.cancel_requested.clear()
+            self.current = job
+            try:
+                if job.incremental and state is None:
+                    state = ImportState(self.state_path)
+                rows, changes = job.run(self.cache, state if job.incremental else None,
+                                        lambda stage, fraction, shape: self.report(job, stage, fraction),
+                                        self.log_path, self.dump_dir)
+            except ProcessingCancelled:
+                self.messages.put(("cancelled", job))
+            except ProcessingError as e:
+                self.messages.put(("failed", job, str(e)))
+            except Exception as e:
+                self.messages.put(("failed", job, f"{type(e).__name__}: {e}"))
+            else:
+                self.messages.put(("done", job, rows, changes))
+            finally:
+                self.current = None
+
+    # Function to pass a progress update to the GUI, or stop the job if it has been cancelled.
+    def report(self, job, stage, fraction):
+        if self.cancel_requested.is_set():
+            raise ProcessingCancelled()
+        self.messages.put(("progress", job, stage, fraction))
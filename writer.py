@@ -0,0 +1,189 @@
+# Output engine. Streams a processed DataFrame into an Excel file with openpyxl's write-only workbook,
+# so rows are serialized as they are appended instead of being held as cell objects until the save.
+# Formatting is applied through named styles shared by every cell instead of a style object per cell.
+
+import os
+
+import openpyxl
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle
+from openpyxl.utils import get_column_letter
+
+from processing import CTRLR_FORMATS, ProcessingError, report_progress, resolve_options
+from settings import CTRLR_COLUMNS, MERGED_CTRLR_IMPORT, TABLE_EXTENSIONS
+
+HEADER_STYLE = "CTRL-R Header"
+# How often, in rows, the write stage reports its progress.
+PROGRESS_ROWS = 5000
+
+# Function to create the named style for the CTRL-R header row.
+def header_style():
+    return NamedStyle(name=HEADER_STYLE, font=Font(bold=True),
+                      alignment=Alignment(horizontal='center', vertical='center'))
+
+# Function to create the named style for the data cells from the formatting options, or None if no
+# alignment option is selected. Each combination of options gets its own style name.
+def data_style(options):
+    # 25: Apply word wrap if selected.
+    wrap_text = options['word_wrap'] == 1
+    # 26: Apply text centering if selected.
+    center_text = options['center_text'] == 1
+    if not wrap_text and not center_text:
+        return None
+
+    if center_text:
+        alignment = Alignment(horizontal='center', vertical='center', wrap_text=wrap_text or None)
+        name = "Centered Wrapped Text" if wrap_text else "Centered Text"
+    else:
+        alignment = Alignment(wrap_text=True)
+        name = "Wrapped Text"
+    return NamedStyle(name=name, alignment=alignment)
+
+# Function to work out the column widths for the general formatting options. Returns a list with one
+# width per column, or None when the columns keep their default width.
+def column_widths(df, options):
+    # 27: Calculate maximum length for autosizing columns. The text length of every value is found for
+    # all columns at once instead of cell by cell after the data is written.
+    max_lengths = None
+    if options['autosize_columns'] == 1:
+        max_lengths = df.astype(str).apply(lambda column: column.str.len().max()).fillna(0)
+    return widths_from_lengths(max_lengths, len(df.columns), options)
+
+# Function to work out the column widths from the longest text of each column, which is only needed when
+# autosizing. Returns a list with one width per column, or None when the columns keep their default width.
+def widths_from_lengths(max_lengths, column_count, options):
+    if options['autosize_columns'] == 1:
+        return [int(max_length) + 2 for max_length in max_lengths]
+    elif options['resize_columns'] == 1:
+        return [options['column_width']] * column_count
+    return None
+
+# Function to apply general formatting to the worksheet. Must be called before any rows are written,
+# because a write-only worksheet writes its column widths ahead of the rows. widths are the column widths
+# from column_widths or widths_from_lengths. Returns the name of the style to give the data cells.
+def general_formatting(ws, widths, options):
+    # 28: Autosize or manually resize columns based on user selection.
+    if widths is not None:
+        for col_idx, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    style = data_style(options)
+    if style is None:
+        return None
+    ws.parent.add_named_style(style)
+    return style.name
+
+# Function to write a processed DataFrame to an Excel file, or to a CSV or Parquet file when the output
+# path ends in .csv or .parquet (see save_table). progress is an optional callback that is told which
+# stage the save is at (see STAGES in settings.py).
+def save_file(df, output_file_path, format_setting, options=None, progress=None):
+    options = resolve_options(options)
+    extension = os.path.splitext(output_file_path)[1].lower()
+    if extension in TABLE_EXTENSIONS:
+        save_table(df, output_file_path, extension, format_setting, progress)
+        return
+
+    # 9: Create a new write-only workbook and worksheet using openpyxl.
+    report_progress(progress, "format", shape=df.shape)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+
+    # 10: Write headers if the format setting requires them.
+    cell_style = None
+    if format_setting in CTRLR_FORMATS or format_setting == MERGED_CTRLR_IMPORT:
+        wb.add_named_style(header_style())
+        header = []
+        for col_name in df.columns:
+            cell = WriteOnlyCell(ws, value=col_name)
+            cell.style = HEADER_STYLE
+            header.append(cell)
+        ws.append(header)
+    else:
+        # 12: Apply general formatting. The widths and the cell style are worked out before the data
+        # is written (see general_formatting).
+        cell_style = general_formatting(ws, column_widths(df, options), options)
+
+    # 11: Write data to the worksheet, a whole row at a time. Missing values are left out so that sparse
+    # reports only write the cells that have something in them.
+    report_progress(progress, "write", shape=df.shape)
+    append_rows(ws, df, cell_style, progress, len(df))
+
+    # 13: Save the workbook to the specified output file path.
+    report_progress(progress, "save", shape=df.shape)
+    wb.save(output_file_path)
+
+# Function to write a CTRL-R import straight from the DataFrame as a CSV or Parquet file. These files have
+# no formatting to apply, so they are written in one step, with the columns in the order CTRL-R expects.
+def save_table(df, output_file_path, extension, format_setting, progress=None):
+    if format_setting not in CTRLR_FORMATS and format_setting != MERGED_CTRLR_IMPORT:
+        raise ProcessingError(f"Only the CTRL-R imports can be saved as {extension[1:].upper()} files. "
+                              f"Save {format_setting} as an Excel file.")
+    df = table_frame(df)
+    report_progress(progress, "write", shape=df.shape)
+    if extension == '.csv':
+        # Whole numbers, such as the certificate counts, are written without a trailing .0.
+        df.to_csv(output_file_path, index=False, float_format='%.15g')
+    else:
+        # Exam Score holds numbers and text such as PASS, which one Parquet column cannot, so the text
+        # columns are saved as strings.
+        df = df.astype({column: 'string' for column in df.select_dtypes(include='object').columns})
+        try:
+            df.to_parquet(output_file_path, index=False)
+        except ImportError as e:
+            raise ProcessingError("Saving Parquet files needs pyarrow. Install it with pip install pyarrow.") from e
+
+# Function to prepare a CTRL-R import for a CSV or Parquet file. Columns that only hold numbers or dates,
+# but are stored as objects (for example after a merge), get their proper type, and whole numbers in the
+# columns that mix numbers and text, such as Exam Score, are written without a trailing .0.
+def table_frame(df):
+    df = df[CTRLR_COLUMNS].infer_objects()
+    for column in df.select_dtypes(include='object').columns:
+        if pd.api.types.infer_dtype(df[column], skipna=True) == 'string':
+            continue
+        # Only the distinct values are converted, since a column repeats a few scores many times.
+        codes, uniques = pd.factorize(df[column])
+        values = pd.Series(uniques, dtype=object)
+        numbers = pd.to_numeric(values, errors='coerce')
+        whole = numbers.notna() & (numbers % 1 == 0)
+        if whole.any():
+            values = values.where(~whole, numbers.where(whole, 0).astype('int64'))
+            df[column] = pd.Series(values.to_numpy().take(codes), index=df.index).where(codes != -1)
+    return df
+
+# Function to append the rows of a DataFrame to a write-only worksheet, giving the data cells cell_style.
+# Missing values are left out. The progress of the write stage is reported out of total rows, counting
+# from start, so a file written a chunk at a time reports its progress through the whole file.
+def append_rows(ws, df, cell_style, progress=None, total=None, start=0):
+    rows = df.itertuples(index=False, name=None)
+    present = df.notna().to_numpy()
+    if progress is not None:
+        rows = reporting_rows(rows, total, progress, start)
+    if cell_style is None:
+        for row, row_present in zip(rows, present):
+            ws.append([value if has_value else None for value, has_value in zip(row, row_present)])
+        return
+
+    # Styled cells are reused for every row. Each row is serialized as soon as it is appended, so only
+    # the values need to change between rows.
+    cells = []
+    for _ in df.columns:
+        cell = WriteOnlyCell(ws)
+        cell.style = cell_style
+        cells.append(cell)
+    for row, row_present in zip(rows, present):
+        values = []
+        for cell, value, has_value in zip(cells, row, row_present):
+            if has_value:
+                cell.value = value
+                values.append(cell)
+            else:
+                values.append(None)
+        ws.append(values)
+
+# Function to pass rows through while reporting the progress of the write stage every PROGRESS_ROWS rows.
+def reporting_rows(rows, total, progress, start=0):
+    for number, row in enumerate(rows, start):
+        if number % PROGRESS_ROWS == 0:
+            report_progress(progress, "write", number / total)
+        yield row